@@ -15,6 +15,8 @@ import uvicorn
 
 from routers import journal, auth, notion, scheduler, genai
 from utils.database import init_db, close_db_connection_pool
+from managers.notion_module.notion_client_pool import NotionClientPool
+from managers.notion_module.notion_webhook_manager import NotionWebhookManager
 
 app = FastAPI()
 
@@ -64,9 +66,12 @@ async def root():
 @app.on_event("startup")
 async def startup_event():
     await init_db()
+    await NotionClientPool.open()
 
 @app.on_event("shutdown")
 async def shutdown_event():
+    await NotionWebhookManager.close()
+    await NotionClientPool.close()
     await close_db_connection_pool()
 
 # if __name__ == "__main__":
@@ -2,8 +2,11 @@
 Custom exceptions for the SupportBuddy application.
 """
 
-from .journal_exceptions import JournalDatabaseNotFound
+from .journal_exceptions import JournalDatabaseNotFound, JournalPageReadIncomplete
+from .genai_exceptions import GenAICircuitOpenError
 
 __all__ = [
-    'JournalDatabaseNotFound'
+    'JournalDatabaseNotFound',
+    'JournalPageReadIncomplete',
+    'GenAICircuitOpenError'
 ]
@@ -0,0 +1,15 @@
+"""
+GenAI-related custom exceptions.
+"""
+
+
+class GenAICircuitOpenError(Exception):
+    """
+    Exception raised when a GenAI call is rejected without being sent because
+    the circuit breaker is open after repeated Gemini failures.
+
+    Callers should use their fallback path right away instead of retrying.
+    """
+
+    def __init__(self, message: str = None):
+        super().__init__(message)
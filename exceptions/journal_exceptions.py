@@ -16,3 +16,16 @@ class JournalDatabaseNotFound(Exception):
     
     def __init__(self, message: str = None):
         super().__init__(message)
+
+
+class JournalPageReadIncomplete(Exception):
+    """
+    Exception raised when the body of a Notion journal page could not be read
+    to the end, because reading timed out or a request failed.
+
+    `page_content` holds the text read so far.
+    """
+
+    def __init__(self, message: str = None, page_content: str = ""):
+        super().__init__(message)
+        self.page_content = page_content
@@ -1,40 +1,149 @@
 import asyncio
 import logging
-from typing import List
 import os
+import socket
+import time
+from datetime import date, datetime, timezone
+from typing import AsyncIterator, List, Optional
 
-from managers.user_manager import UserManager
+from managers.user_manager import UserManager, ACTIVE_USERS_PAGE_SIZE
 from managers.journal_manager import JournalManager
-from models.models import User
+from managers.journal_pipeline import JournalPipeline
+from managers.journal_sync_manager import JournalSyncManager
+from managers.run_ledger_manager import RunLedgerManager
+from models.models import NotionUserRecord
+from exceptions.journal_exceptions import JournalDatabaseNotFound
+from utils.run_stats import RunStats
 
 logger = logging.getLogger(__name__)
 
+# Number of users a sharded worker claims from the run ledger at a time
+DEFAULT_SHARD_CLAIM_SIZE = 10
+# Users synced from Notion at the same time
+DEFAULT_SYNC_CONCURRENCY = 10
+
 class BatchProcessor:
     def __init__(self):
         self.user_manager = UserManager()
         self.journal_manager = JournalManager()
+        self.run_ledger_manager = RunLedgerManager()
+        self.journal_sync_manager = JournalSyncManager()
+
+    async def process_notion_users_in_batches(self, offline: bool = False):
+        """
+        Processes all active Notion users through the staged journal pipeline.
 
-    async def process_notion_users_in_batches(self, batch_size: int = 5):
-        logger.info("Starting batch processing for Notion users.")
-        active_notion_users = await self.user_manager.get_active_notion_users()
-        logger.info(f"Found {len(active_notion_users)} active Notion users.")
+        With `offline`, the replies for the whole run are generated by one
+        Gemini batch job before any email is sent, which is cheaper and has
+        higher rate limits than interactive calls.
 
-        if not active_notion_users:
-            logger.info("No active Notion users to process.")
+        Progress is recorded in the run ledger for today's run date, so
+        re-triggering the job after a restart skips users that are already
+        done. Concurrency is configured per stage, see JournalPipeline.
+        """
+        run_date = datetime.now(timezone.utc).date()
+        logger.info(f"Starting batch processing for Notion users for run date {run_date} (offline={offline}).")
+        pipeline = JournalPipeline(self.journal_manager, self.run_ledger_manager, run_date, offline=offline)
+        users = self._iter_unfinished_users(run_date)
+        summary = await pipeline.run(users)
+
+        if summary["processed"] == 0:
+            logger.info("No pending Notion users to process.")
             return
 
-        for i in range(0, len(active_notion_users), batch_size):
-            batch = active_notion_users[i:i + batch_size]
-            tasks = []
-            for user in batch:
-                logger.info(f"Adding task for user {user.id} ({user.email})")
-                tasks.append(self.journal_manager.process_and_email_user_journal(user))
-            
-            # Run tasks concurrently for the current batch
-            await asyncio.gather(*tasks, return_exceptions=True) # return_exceptions to prevent one failure from stopping others
-            logger.info(f"Processed batch {i // batch_size + 1}.")
+        logger.info(f"Finished batch processing for Notion users. Summary: {summary}")
+
+    async def process_notion_users_sharded(self, worker_id: Optional[str] = None):
+        """
+        Processes Notion users as one of several cooperating workers.
+
+        Every worker seeds the run ledger for today's run date (idempotent) and
+        then keeps claiming small, disjoint slices of unfinished users until
+        none are left. Workers may run in one process or on several machines.
+        """
+        run_date = datetime.now(timezone.utc).date()
+        worker_id = worker_id or os.environ.get("WORKER_ID") or f"{socket.gethostname()}-{os.getpid()}"
+        logger.info(f"Worker {worker_id} starting sharded processing for run date {run_date}.")
+
+        seeded_count = await self.run_ledger_manager.seed_run(run_date)
+        logger.info(f"Worker {worker_id} seeded {seeded_count} new run ledger rows.")
+
+        pipeline = JournalPipeline(self.journal_manager, self.run_ledger_manager, run_date, worker_id=worker_id)
+        summary = await pipeline.run(self._iter_claimed_users(run_date, worker_id))
+        logger.info(f"Worker {worker_id} finished sharded processing. Summary: {summary}")
+
+    async def _iter_claimed_users(self, run_date: date, worker_id: str) -> AsyncIterator[NotionUserRecord]:
+        claim_size = int(os.environ.get("SHARD_CLAIM_SIZE", DEFAULT_SHARD_CLAIM_SIZE))
+        while True:
+            # Claims are only made when the pipeline has room, so slices stay small and balanced
+            claimed_users = await self.run_ledger_manager.claim_users(run_date, worker_id, claim_size)
+            if not claimed_users:
+                return
+            for user in claimed_users:
+                yield user
 
-        logger.info("Finished batch processing for Notion users.")
+    async def _iter_unfinished_users(self, run_date: date) -> AsyncIterator[NotionUserRecord]:
+        """
+        Registers streamed users in the run ledger page by page and yields only
+        those not yet finished for the run date.
+        """
+        page: List[NotionUserRecord] = []
+        async for user in self.user_manager.iter_active_notion_users():
+            page.append(user)
+            if len(page) >= ACTIVE_USERS_PAGE_SIZE:
+                async for pending_user in self._filter_finished(run_date, page):
+                    yield pending_user
+                page = []
+
+        async for pending_user in self._filter_finished(run_date, page):
+            yield pending_user
+
+    async def _filter_finished(self, run_date: date, users: List[NotionUserRecord]) -> AsyncIterator[NotionUserRecord]:
+        finished_user_ids = await self.run_ledger_manager.register_users(run_date, [user.id for user in users])
+        if finished_user_ids:
+            logger.info(f"Skipping {len(finished_user_ids)} users already finished for run date {run_date}.")
+        for user in users:
+            if user.id not in finished_user_ids:
+                yield user
+
+    async def sync_notion_journals(self):
+        """
+        Syncs the journal pages changed since the last sync of every active
+        Notion user into the local mirror, see JournalSyncManager.
+        """
+        concurrency = int(os.environ.get("NOTION_SYNC_CONCURRENCY", DEFAULT_SYNC_CONCURRENCY))
+        semaphore = asyncio.Semaphore(concurrency)
+        stats = RunStats()
+        logger.info(f"Starting Notion journal sync (concurrency={concurrency}).")
+
+        page: List[NotionUserRecord] = []
+        async for user in self.user_manager.iter_active_notion_users():
+            page.append(user)
+            if len(page) >= ACTIVE_USERS_PAGE_SIZE:
+                await asyncio.gather(*[self._sync_user_journal(user, semaphore, stats) for user in page])
+                page = []
+        await asyncio.gather(*[self._sync_user_journal(user, semaphore, stats) for user in page])
+
+        logger.info(f"Finished Notion journal sync. Summary: {stats.summary()}")
+
+    async def _sync_user_journal(self, user: NotionUserRecord, semaphore: asyncio.Semaphore, stats: RunStats):
+        if user.integration_error:
+            stats.record(0.0, False)
+            return
+        if not user.notion_integration:
+            return
+        async with semaphore:
+            started_at = time.monotonic()
+            try:
+                await self.journal_sync_manager.sync_user(user.id, user.notion_integration)
+                stats.record(time.monotonic() - started_at, True)
+            except JournalDatabaseNotFound:
+                logger.info(f"Database not found for user {user.id} during sync. Deactivating user")
+                await self.user_manager.deactivate_users([user.id])
+                stats.record(time.monotonic() - started_at, True)
+            except Exception as e:
+                logger.error(f"Error syncing Notion journal for user {user.id}: {e}")
+                stats.record(time.monotonic() - started_at, False)
 
     async def process_user_deactivation(self):
         """
@@ -0,0 +1,143 @@
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Tuple
+
+from models.models import LLMResponseCache
+
+logger = logging.getLogger(__name__)
+
+GENAI_CACHE_TTL_SECONDS = 24 * 60 * 60
+GENAI_CACHE_MAX_ENTRIES = 1000
+GENAI_CACHE_PURGE_INTERVAL_SECONDS = 60 * 60  # Expired database rows are deleted at most this often
+
+
+class GenAIResponseCache:
+    """
+    Content-addressed cache of LLM responses.
+
+    Keys are hashes of everything that shapes a generation (model, prompt
+    template versions, the exact journal JSON and the generation config), so
+    identical input is answered without calling the model again. Entries live
+    in a TTL-bounded in-memory LRU and, with GENAI_CACHE_DB_ENABLED=true, in
+    the `llm_response_cache` table shared by all processes. Expired rows are
+    deleted on write, at most every GENAI_CACHE_PURGE_INTERVAL_SECONDS.
+    """
+
+    _entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+    _last_purge = 0.0
+    hits = 0
+    db_hits = 0
+    misses = 0
+
+    @staticmethod
+    def is_enabled() -> bool:
+        return os.getenv("GENAI_CACHE_ENABLED", "true").lower() == "true"
+
+    @staticmethod
+    def _is_db_enabled() -> bool:
+        return os.getenv("GENAI_CACHE_DB_ENABLED", "false").lower() == "true"
+
+    @staticmethod
+    def make_key(**parts) -> str:
+        payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    @classmethod
+    async def get(cls, key: str) -> Optional[str]:
+        if not cls.is_enabled():
+            return None
+
+        entry = cls._entries.get(key)
+        if entry:
+            value, expires_at = entry
+            if expires_at > time.time():
+                cls._entries.move_to_end(key)
+                cls.hits += 1
+                return value
+            del cls._entries[key]
+
+        if cls._is_db_enabled():
+            try:
+                row = await LLMResponseCache.filter(
+                    cache_key=key,
+                    expires_at__gt=datetime.now(timezone.utc)
+                ).first()
+            except Exception as e:
+                logger.warning(f"Error reading GenAI response cache from database: {e}")
+                row = None
+            if row:
+                cls._store_in_memory(key, row.response, row.expires_at.timestamp())
+                cls.db_hits += 1
+                return row.response
+
+        cls.misses += 1
+        return None
+
+    @classmethod
+    async def set(cls, key: str, value: str):
+        if not cls.is_enabled() or not value:
+            return
+
+        ttl = float(os.getenv("GENAI_CACHE_TTL_SECONDS", GENAI_CACHE_TTL_SECONDS))
+        expires_at = time.time() + ttl
+        cls._store_in_memory(key, value, expires_at)
+
+        if cls._is_db_enabled():
+            try:
+                await LLMResponseCache.update_or_create(
+                    defaults={
+                        "response": value,
+                        "expires_at": datetime.now(timezone.utc) + timedelta(seconds=ttl),
+                    },
+                    cache_key=key
+                )
+            except Exception as e:
+                logger.warning(f"Error writing GenAI response cache to database: {e}")
+            await cls._maybe_purge_expired()
+
+    @classmethod
+    async def _maybe_purge_expired(cls):
+        purge_interval = float(os.getenv("GENAI_CACHE_PURGE_INTERVAL_SECONDS", GENAI_CACHE_PURGE_INTERVAL_SECONDS))
+        if time.monotonic() - cls._last_purge < purge_interval:
+            return
+        cls._last_purge = time.monotonic()
+        await cls.purge_expired()
+
+    @classmethod
+    async def purge_expired(cls) -> int:
+        """
+        Deletes expired rows from `llm_response_cache`, they hold text derived
+        from user journals. Returns the number of rows deleted.
+        """
+        try:
+            deleted_count = await LLMResponseCache.filter(expires_at__lte=datetime.now(timezone.utc)).delete()
+        except Exception as e:
+            logger.warning(f"Error purging expired GenAI response cache rows: {e}")
+            return 0
+        if deleted_count:
+            logger.info(f"Purged {deleted_count} expired GenAI response cache rows.")
+        return deleted_count
+
+    @classmethod
+    def _store_in_memory(cls, key: str, value: str, expires_at: float):
+        max_entries = int(os.getenv("GENAI_CACHE_MAX_ENTRIES", GENAI_CACHE_MAX_ENTRIES))
+        cls._entries[key] = (value, expires_at)
+        cls._entries.move_to_end(key)
+        while len(cls._entries) > max_entries:
+            cls._entries.popitem(last=False)
+
+    @classmethod
+    def stats(cls) -> dict:
+        lookups = cls.hits + cls.db_hits + cls.misses
+        return {
+            "hits": cls.hits,
+            "db_hits": cls.db_hits,
+            "misses": cls.misses,
+            "hit_rate": round((cls.hits + cls.db_hits) / lookups, 3) if lookups else 0.0,
+            "entries": len(cls._entries),
+        }
@@ -0,0 +1,140 @@
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Optional, TypeVar
+
+from google.genai.errors import APIError
+
+from exceptions.genai_exceptions import GenAICircuitOpenError
+
+logger = logging.getLogger(__name__)
+
+GENAI_BREAKER_FAILURE_THRESHOLD = 5  # Consecutive failed calls that open the circuit
+GENAI_BREAKER_OPEN_SECONDS = 30  # Time calls fail fast before a probe is let through
+
+T = TypeVar("T")
+
+
+class GenAICircuitBreaker:
+    """
+    Shared circuit breaker around Gemini calls.
+
+    While closed, calls go through and consecutive failures are counted. After
+    GENAI_BREAKER_FAILURE_THRESHOLD failures the circuit opens and calls raise
+    GenAICircuitOpenError at once, so callers go straight to their fallback.
+    After GENAI_BREAKER_OPEN_SECONDS it is half-open: a single probe call is
+    let through, which closes the circuit on success and reopens it on failure.
+
+    Calls Gemini rejected with a 4xx (other than 408/429) do not count towards
+    tripping, but are tracked as failed outcomes for the health endpoint.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: Optional[int] = None, open_seconds: Optional[float] = None):
+        self.failure_threshold = failure_threshold or int(
+            os.getenv("GENAI_BREAKER_FAILURE_THRESHOLD", GENAI_BREAKER_FAILURE_THRESHOLD)
+        )
+        self.open_seconds = open_seconds or float(os.getenv("GENAI_BREAKER_OPEN_SECONDS", GENAI_BREAKER_OPEN_SECONDS))
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        # Calls rejected in a row, e.g. all of them with an invalid API key or model name
+        self.consecutive_rejections = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self.trips = 0
+        self.short_circuited = 0
+        # Outcome of the latest calls, served by the health endpoint without calling Gemini
+        self.last_success_at: Optional[datetime] = None
+        self.last_failure_at: Optional[datetime] = None
+        self.last_error: Optional[str] = None
+
+    @staticmethod
+    def _is_failure(error: Exception) -> bool:
+        # Gemini answered and rejected the request itself, which says nothing about an outage
+        if isinstance(error, APIError) and 400 <= error.code < 500 and error.code not in (408, 429):
+            return False
+        return True
+
+    def before_call(self):
+        """
+        Raises GenAICircuitOpenError if the call must not be sent.
+        """
+        if self.state == self.OPEN:
+            if time.monotonic() - self.opened_at < self.open_seconds:
+                self.short_circuited += 1
+                raise GenAICircuitOpenError("GenAI circuit breaker is open, skipping the call")
+            self.state = self.HALF_OPEN
+            logger.info("GenAI circuit breaker is half-open, sending a probe call.")
+
+        if self.state == self.HALF_OPEN:
+            if self._probe_in_flight:
+                self.short_circuited += 1
+                raise GenAICircuitOpenError("GenAI circuit breaker is half-open and a probe is in flight")
+            self._probe_in_flight = True
+
+    def _close(self):
+        if self.state != self.CLOSED:
+            logger.info("GenAI probe call was answered, closing the circuit breaker.")
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self._probe_in_flight = False
+
+    def record_success(self):
+        self._close()
+        self.consecutive_rejections = 0
+        self.last_success_at = datetime.now(timezone.utc)
+
+    def record_error(self, error: Exception):
+        self.last_failure_at = datetime.now(timezone.utc)
+        self.last_error = str(error)
+        if not self._is_failure(error):
+            # Gemini answered, so the circuit closes, but the call still failed
+            self.consecutive_rejections += 1
+            self._close()
+            return
+
+        self._probe_in_flight = False
+        self.consecutive_failures += 1
+        if self.state == self.HALF_OPEN or (
+            self.state == self.CLOSED and self.consecutive_failures >= self.failure_threshold
+        ):
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+            self.trips += 1
+            logger.warning(
+                f"GenAI circuit breaker opened after {self.consecutive_failures} consecutive failures, "
+                f"failing fast for {self.open_seconds} seconds."
+            )
+
+    def record_cancelled(self):
+        # A cancelled probe proved nothing, let the next call probe instead
+        self._probe_in_flight = False
+
+    async def call(self, func: Callable[[], Awaitable[T]]) -> T:
+        self.before_call()
+        try:
+            result = await func()
+        except asyncio.CancelledError:
+            self.record_cancelled()
+            raise
+        except Exception as e:
+            self.record_error(e)
+            raise
+        self.record_success()
+        return result
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "consecutive_rejections": self.consecutive_rejections,
+            "trips": self.trips,
+            "short_circuited": self.short_circuited,
+            "last_success_at": self.last_success_at.isoformat() if self.last_success_at else None,
+            "last_failure_at": self.last_failure_at.isoformat() if self.last_failure_at else None,
+        }
@@ -0,0 +1,110 @@
+import asyncio
+import hashlib
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+from google.genai.types import (
+    CachedContent,
+    Content,
+    CreateCachedContentConfig,
+    Part,
+    UpdateCachedContentConfig,
+)
+
+logger = logging.getLogger(__name__)
+
+GENAI_CONTEXT_CACHE_TTL_SECONDS = 60 * 60
+# Handles closer than this to expiry are extended before being handed out
+GENAI_CONTEXT_CACHE_REFRESH_MARGIN_SECONDS = 5 * 60
+# After a failed create, calls send the full prompt for this long before trying again
+GENAI_CONTEXT_CACHE_RETRY_SECONDS = 5 * 60
+
+
+class GenAIContextCache:
+    """
+    Keeps Gemini cached-content handles for static prompt prefixes.
+
+    A handle is created once per (model, system prompt, prefix) and its TTL is
+    extended shortly before it expires, so per-user requests only need to send
+    their own part of the prompt. Editing a prompt file changes the key, which
+    creates a new handle and lets the old one expire.
+    """
+
+    def __init__(self, caches):
+        # Either `client.aio.caches` or LocalGenAICaches
+        self.caches = caches
+        self._handles: Dict[str, CachedContent] = {}
+        self._lock = asyncio.Lock()
+        self._disabled_until = 0.0
+
+    @staticmethod
+    def _make_key(model: str, prefix: str, system_prompt: Optional[str]) -> str:
+        payload = "\0".join([model, system_prompt or "", prefix])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _seconds_left(handle: CachedContent) -> float:
+        if not handle.expire_time:
+            return 0.0
+        return (handle.expire_time - datetime.now(timezone.utc)).total_seconds()
+
+    async def get_handle(self, model: str, prefix: str, system_prompt: Optional[str] = None) -> Optional[str]:
+        """
+        Returns the cached-content name for the prefix, or None if caching is unavailable.
+        """
+        key = self._make_key(model, prefix, system_prompt)
+        handle = self._handles.get(key)
+        if handle and self._seconds_left(handle) > GENAI_CONTEXT_CACHE_REFRESH_MARGIN_SECONDS:
+            return handle.name
+        if time.monotonic() < self._disabled_until:
+            return None
+
+        # Only one caller creates or refreshes a handle, the others reuse it
+        async with self._lock:
+            handle = self._handles.get(key)
+            if handle and self._seconds_left(handle) > GENAI_CONTEXT_CACHE_REFRESH_MARGIN_SECONDS:
+                return handle.name
+
+            ttl = f"{GENAI_CONTEXT_CACHE_TTL_SECONDS}s"
+            try:
+                if handle and self._seconds_left(handle) > 0:
+                    handle = await self.caches.update(
+                        name=handle.name,
+                        config=UpdateCachedContentConfig(ttl=ttl),
+                    )
+                    logger.info(f"Extended cached content {handle.name}.")
+                else:
+                    handle = await self.caches.create(
+                        model=model,
+                        config=CreateCachedContentConfig(
+                            contents=[Content(role="user", parts=[Part.from_text(text=prefix)])],
+                            system_instruction=system_prompt,
+                            ttl=ttl,
+                            display_name=f"prompt-prefix-{key[:12]}",
+                        ),
+                    )
+                    logger.info(f"Created cached content {handle.name} for prompt prefix.")
+            except Exception as e:
+                logger.warning(f"Error creating cached content, sending full prompts for now: {e}")
+                self._handles.pop(key, None)
+                self._disabled_until = time.monotonic() + GENAI_CONTEXT_CACHE_RETRY_SECONDS
+                return None
+
+            # Drop handles that have expired, e.g. for an older version of a prompt
+            self._handles = {
+                existing_key: existing
+                for existing_key, existing in self._handles.items()
+                if self._seconds_left(existing) > 0
+            }
+            self._handles[key] = handle
+            return handle.name
+
+    def invalidate(self, name: str):
+        """
+        Forgets a handle that Gemini no longer accepts, so the next call creates a new one.
+        """
+        self._handles = {
+            key: handle for key, handle in self._handles.items() if handle.name != name
+        }
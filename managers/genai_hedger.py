@@ -0,0 +1,136 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+GENAI_HEDGE_PERCENTILE = 95  # Calls slower than this percentile of recent calls are hedged
+GENAI_HEDGE_BUDGET_PERCENT = 5  # Maximum share of calls that may send a hedge
+GENAI_HEDGE_MIN_SAMPLES = 20  # Recent latencies needed before any call is hedged
+# Recent latencies kept per profile, the hedge delay follows this window
+HEDGE_LATENCY_WINDOW = 500
+# The hedge delay is recomputed after this many new samples rather than on every call
+HEDGE_DELAY_REFRESH_CALLS = 20
+
+
+class GenAIHedger:
+    """
+    Sends a duplicate request to a fallback model when a call runs unusually long.
+
+    A call that has not finished after the configured percentile of recent
+    latencies for its profile gets a hedge request, and the first non-empty
+    response wins while the other request is cancelled. Hedges are capped at
+    a percentage of all calls, so a general slowdown does not double the load.
+    """
+
+    def __init__(
+        self,
+        percentile: Optional[float] = None,
+        budget_percent: Optional[float] = None,
+        min_samples: Optional[int] = None
+    ):
+        self.percentile = percentile or float(os.getenv("GENAI_HEDGE_PERCENTILE", GENAI_HEDGE_PERCENTILE))
+        self.budget_percent = budget_percent or float(os.getenv("GENAI_HEDGE_BUDGET_PERCENT", GENAI_HEDGE_BUDGET_PERCENT))
+        self.min_samples = min_samples or int(os.getenv("GENAI_HEDGE_MIN_SAMPLES", GENAI_HEDGE_MIN_SAMPLES))
+        self._latencies: Dict[str, Deque[float]] = {}
+        # profile -> (delay, samples recorded since it was computed)
+        self._delays: Dict[str, list] = {}
+        self.calls = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.hedges_over_budget = 0
+
+    def _record_latency(self, profile: str, latency: float):
+        self._latencies.setdefault(profile, deque(maxlen=HEDGE_LATENCY_WINDOW)).append(latency)
+        if profile in self._delays:
+            self._delays[profile][1] += 1
+
+    def get_hedge_delay(self, profile: str) -> Optional[float]:
+        """
+        Returns how long a call of this profile runs before it is hedged, or None
+        while there are too few samples to tell what slow means.
+        """
+        latencies = self._latencies.get(profile)
+        if not latencies or len(latencies) < self.min_samples:
+            return None
+        cached = self._delays.get(profile)
+        if cached is None or cached[1] >= HEDGE_DELAY_REFRESH_CALLS:
+            ordered = sorted(latencies)
+            index = min(len(ordered) - 1, int(round(self.percentile / 100 * (len(ordered) - 1))))
+            cached = self._delays[profile] = [ordered[index], 0]
+        return cached[0]
+
+    def _within_budget(self) -> bool:
+        return self.hedges < self.calls * self.budget_percent / 100
+
+    async def run(
+        self,
+        profile: str,
+        primary: Callable[[], Awaitable[str]],
+        hedge: Callable[[], Awaitable[str]]
+    ) -> str:
+        self.calls += 1
+        started_at = time.monotonic()
+        primary_task = asyncio.ensure_future(primary())
+        delay = self.get_hedge_delay(profile)
+
+        try:
+            if delay is not None:
+                done, _ = await asyncio.wait({primary_task}, timeout=delay)
+                if not done:
+                    if self._within_budget():
+                        return await self._race(profile, started_at, primary_task, hedge)
+                    self.hedges_over_budget += 1
+
+            result = await primary_task
+            self._record_latency(profile, time.monotonic() - started_at)
+            return result
+        finally:
+            if not primary_task.done():
+                primary_task.cancel()
+
+    async def _race(
+        self,
+        profile: str,
+        started_at: float,
+        primary_task: "asyncio.Future[str]",
+        hedge: Callable[[], Awaitable[str]]
+    ) -> str:
+        self.hedges += 1
+        logger.info(f"GenAI call for profile {profile} is slow, sending a hedge request.")
+        hedge_task = asyncio.ensure_future(hedge())
+        pending = {primary_task, hedge_task}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.cancelled() or task.exception() is not None:
+                        continue
+                    result = task.result()
+                    if result and result.strip():
+                        if task is hedge_task:
+                            self.hedge_wins += 1
+                        return result
+        finally:
+            for task in pending:
+                task.cancel()
+            # A cancelled primary still tells us the call took at least this long
+            self._record_latency(profile, time.monotonic() - started_at)
+
+        # Neither request produced text, report the primary outcome as if unhedged
+        return primary_task.result()
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "hedges": self.hedges,
+            "hedge_rate": round(self.hedges / self.calls, 3) if self.calls else 0.0,
+            "hedge_wins": self.hedge_wins,
+            "hedges_over_budget": self.hedges_over_budget,
+            "hedge_delay_seconds": {
+                profile: round(delay, 2) for profile, (delay, _) in self._delays.items()
+            },
+        }
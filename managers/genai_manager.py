@@ -1,16 +1,32 @@
 from google import genai
 from google.genai.types import (
+    CreateBatchJobConfig,
     GenerateContentConfig,
     HttpOptions,
     HttpRetryOptions,
+    InlinedRequest,
+    JobState,
     ThinkingConfig,
     Part,
     Content,
 )
+import asyncio
 import os
+import time
+from typing import AsyncIterator, List, Optional
 from dotenv import load_dotenv
 import logging
-from pathlib import Path
+
+from google.genai.errors import APIError
+
+from managers.genai_circuit_breaker import GenAICircuitBreaker
+from managers.genai_context_cache import GenAIContextCache
+from managers.genai_hedger import GenAIHedger
+from managers.genai_rate_limiter import GenAIRateLimiter
+from managers.local_genai_batches import LocalGenAIBatches
+from managers.local_genai_caches import LocalGenAICaches
+from utils.prompt_registry import PromptRegistry
+from utils.token_counter import TokenCounter
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
@@ -18,9 +34,59 @@ logger.setLevel(logging.INFO)
 # Load environment variables
 load_dotenv()
 
+# Generation profiles, selected per call site. The model of a profile defaults to
+# GOOGLE_GENAI_MODEL and can be overridden with GENAI_<PROFILE>_MODEL.
+# A thinking budget of 0 disables thinking, which gemini-2.5-pro does not support.
+GENERATION_PROFILES = {
+    # Motivational replies, also used by batch and combined calls
+    "journal": {
+        "temperature": 1.5,  # More creative temperature
+        "max_output_tokens": 3000,
+        "thinking_budget": 3000,
+    },
+    # A single short subject line
+    "subject": {
+        "temperature": 1.0,
+        "max_output_tokens": 100,
+        "thinking_budget": 0,
+    },
+    # Liveness probes only need a word back
+    "health": {
+        "temperature": 0.0,
+        "max_output_tokens": 10,
+        "thinking_budget": 0,
+    },
+}
+DEFAULT_GENERATION_PROFILE = "journal"
+
+# Rate limiting of interactive calls, see GenAIRateLimiter
+GENAI_RATE_LIMIT_RETRIES = 3  # Retries after a 429 response
+GENAI_MAX_RETRY_DELAY_SECONDS = 60
+
+# Hedging of slow interactive calls, see GenAIHedger. Enabled with GENAI_HEDGING_ENABLED=true.
+GENAI_HEDGE_MODEL = "gemini-2.5-flash-lite"  # Faster model that answers hedge requests
+
+# Batch API settings, each can be overridden by the environment variable of the same name
+GENAI_BATCH_MAX_REQUESTS = 500  # Inline requests per batch job
+GENAI_BATCH_POLL_SECONDS = 30
+GENAI_BATCH_TIMEOUT_SECONDS = 24 * 60 * 60
+
+BATCH_TERMINAL_STATES = (
+    JobState.JOB_STATE_SUCCEEDED,
+    JobState.JOB_STATE_PARTIALLY_SUCCEEDED,
+    JobState.JOB_STATE_FAILED,
+    JobState.JOB_STATE_CANCELLED,
+    JobState.JOB_STATE_EXPIRED,
+)
+
 
 class GenAIManager:
     _client = None
+    _local_batches = None
+    _rate_limiter = None
+    _context_cache = None
+    _hedger = None
+    _circuit_breaker = None
 
     @classmethod
     def _get_client(cls):
@@ -34,6 +100,8 @@ class GenAIManager:
                 max_delay=10.0,  # Maximum delay in seconds
                 exp_base=2.0,  # Exponential backoff multiplier
                 jitter=0.1,  # Randomness factor for delay
+                # 429s are left to GenAIRateLimiter so it can adapt concurrency
+                http_status_codes=[408, 500, 502, 503, 504],
             )
 
             http_options = HttpOptions(
@@ -47,31 +115,188 @@ class GenAIManager:
             cls._client = sync_client.aio
         return cls._client
 
-    @classmethod
-    async def generate(cls, prompt: str, system_prompt: str = None):
-        model_name = os.getenv("GOOGLE_GENAI_MODEL", "gemini-2.5-flash")
-        client = cls._get_client()
+    @staticmethod
+    def get_generation_settings(profile: str = DEFAULT_GENERATION_PROFILE) -> dict:
+        """
+        Returns the model and settings of a generation profile, e.g. for cache keys.
+        """
+        if profile not in GENERATION_PROFILES:
+            raise ValueError(f"Unknown generation profile: {profile}")
+        default_model = os.getenv("GOOGLE_GENAI_MODEL", "gemini-2.5-flash")
+        return {
+            "model": os.getenv(f"GENAI_{profile.upper()}_MODEL", default_model),
+            **GENERATION_PROFILES[profile],
+        }
 
+    @staticmethod
+    def _build_config(
+        system_prompt: str = None,
+        response_schema=None,
+        cached_content: str = None,
+        settings: dict = None
+    ) -> GenerateContentConfig:
+        settings = settings or GenAIManager.get_generation_settings()
         # Build config with system instruction if provided
         config_params = {
-            "temperature": 1.5,  # More creative temperature
-            "max_output_tokens": 3000,
+            "temperature": settings["temperature"],
+            "max_output_tokens": settings["max_output_tokens"],
             "thinking_config": ThinkingConfig(
-                thinking_budget=3000,  # Automatic thinking budget
+                thinking_budget=settings["thinking_budget"],
             ),
         }
 
         if system_prompt:
             config_params["system_instruction"] = [Part.from_text(text=system_prompt)]
 
-        config = GenerateContentConfig(**config_params)
+        # Ask for JSON matching the schema, the caller parses response.text
+        if response_schema is not None:
+            config_params["response_mime_type"] = "application/json"
+            config_params["response_schema"] = response_schema
+
+        # The cached content already carries the system instruction and prompt prefix
+        if cached_content:
+            config_params["cached_content"] = cached_content
+
+        return GenerateContentConfig(**config_params)
+
+    @staticmethod
+    def _is_context_cache_local() -> bool:
+        return os.getenv("GENAI_CONTEXT_CACHE_BACKEND", "gemini").lower() == "local"
+
+    @classmethod
+    def _get_context_cache(cls) -> GenAIContextCache:
+        if cls._context_cache is None:
+            if cls._is_context_cache_local():
+                caches = LocalGenAICaches()
+            else:
+                caches = cls._get_client().caches
+            cls._context_cache = GenAIContextCache(caches)
+        return cls._context_cache
+
+    @classmethod
+    async def get_cached_prefix(
+        cls,
+        prefix: str,
+        system_prompt: str = None,
+        profile: str = DEFAULT_GENERATION_PROFILE
+    ) -> Optional[str]:
+        """
+        Returns a cached-content handle for a static prompt prefix, or None when
+        context caching is disabled (GENAI_CONTEXT_CACHE_ENABLED) or unavailable.
+        """
+        if os.getenv("GENAI_CONTEXT_CACHE_ENABLED", "false").lower() != "true":
+            return None
+        # Cached content only serves requests to the model it was created for
+        model_name = cls.get_generation_settings(profile)["model"]
+        return await cls._get_context_cache().get_handle(model_name, prefix, system_prompt)
+
+    @classmethod
+    def invalidate_cached_prefix(cls, cached_content: str):
+        cls._get_context_cache().invalidate(cached_content)
 
-        response = await client.models.generate_content(
-            model=model_name,
-            contents=[Content(role="user", parts=[Part.from_text(text=prompt)])],
-            config=config,
+    @classmethod
+    async def generate(
+        cls,
+        prompt: str,
+        system_prompt: str = None,
+        response_schema=None,
+        cached_content: str = None,
+        profile: str = DEFAULT_GENERATION_PROFILE
+    ):
+        settings = cls.get_generation_settings(profile)
+        model_name = settings["model"]
+        contents = [Content(role="user", parts=[Part.from_text(text=prompt)])]
+
+        if cached_content and cls._is_context_cache_local():
+            # The local stand-in cannot be referenced by Gemini, so expand the handle here
+            cached_entry = cls._get_context_cache().caches.resolve(cached_content)
+            if not cached_entry:
+                raise APIError(404, {"error": {"code": 404, "message": f"Cached content {cached_content} not found."}})
+            contents = list(cached_entry["contents"]) + contents
+            system_prompt = cached_entry["system_instruction"]
+            cached_content = None
+
+        estimated_tokens = cls._estimate_tokens(prompt, system_prompt)
+
+        # While Gemini is failing, calls raise GenAICircuitOpenError at once so callers use their fallback
+        return await cls.get_circuit_breaker().call(
+            lambda: cls._generate_hedged(
+                contents, system_prompt, response_schema, cached_content, settings, profile, estimated_tokens
+            )
+        )
+
+    @classmethod
+    async def _generate_hedged(
+        cls,
+        contents: List[Content],
+        system_prompt: Optional[str],
+        response_schema,
+        cached_content: Optional[str],
+        settings: dict,
+        profile: str,
+        estimated_tokens: int
+    ) -> str:
+        model_name = settings["model"]
+        # A hedge goes to a different model, which cannot use a Gemini cached-content handle
+        hedge_model = os.getenv("GENAI_HEDGE_MODEL", GENAI_HEDGE_MODEL)
+        if cls._is_hedging_enabled() and not cached_content and hedge_model != model_name:
+            hedge_settings = {**settings, "model": hedge_model}
+            return await cls.get_hedger().run(
+                profile,
+                lambda: cls._generate_content(
+                    contents, system_prompt, response_schema, None, settings, estimated_tokens
+                ),
+                lambda: cls._generate_content(
+                    contents, system_prompt, response_schema, None, hedge_settings, estimated_tokens
+                ),
+            )
+
+        return await cls._generate_content(
+            contents, system_prompt, response_schema, cached_content, settings, estimated_tokens
         )
 
+    @classmethod
+    async def _generate_content(
+        cls,
+        contents: List[Content],
+        system_prompt: Optional[str],
+        response_schema,
+        cached_content: Optional[str],
+        settings: dict,
+        estimated_tokens: int
+    ) -> str:
+        model_name = settings["model"]
+        client = cls._get_client()
+        config = cls._build_config(system_prompt, response_schema, cached_content, settings)
+
+        # Every caller shares one limiter, so bursts are held back before Gemini rejects them
+        rate_limiter = cls.get_rate_limiter()
+        for attempt in range(GENAI_RATE_LIMIT_RETRIES + 1):
+            await rate_limiter.acquire(estimated_tokens)
+            actual_tokens = None
+            throttled = False
+            try:
+                response = await client.models.generate_content(
+                    model=model_name,
+                    contents=contents,
+                    config=config,
+                )
+                if response.usage_metadata and response.usage_metadata.prompt_token_count:
+                    actual_tokens = response.usage_metadata.prompt_token_count
+                break
+            except APIError as e:
+                if e.code != 429:
+                    raise
+                throttled = True
+                if attempt >= GENAI_RATE_LIMIT_RETRIES:
+                    raise
+                retry_delay = cls._get_retry_delay(e, attempt)
+            finally:
+                await rate_limiter.release(estimated_tokens, actual_tokens, throttled)
+
+            logger.warning(f"Gemini rate limit hit on attempt {attempt + 1}, retrying in {retry_delay:.1f}s")
+            await asyncio.sleep(retry_delay)
+
         try:
             # Check if response has candidates and log finish reason safely
             if (hasattr(response, "candidates") and 
@@ -94,26 +319,245 @@ class GenAIManager:
 
         return response.text
 
+    @classmethod
+    async def generate_stream(
+        cls,
+        prompt: str,
+        system_prompt: str = None,
+        profile: str = DEFAULT_GENERATION_PROFILE
+    ) -> AsyncIterator[str]:
+        """
+        Yields the response text chunk by chunk as Gemini produces it.
+
+        The call holds one rate limiter slot until the stream is exhausted or
+        closed. Errors are raised to the caller, which decides whether to fall
+        back depending on whether any chunk was already delivered.
+        """
+        settings = cls.get_generation_settings(profile)
+        model_name = settings["model"]
+        client = cls._get_client()
+        contents = [Content(role="user", parts=[Part.from_text(text=prompt)])]
+        config = cls._build_config(system_prompt, settings=settings)
+
+        circuit_breaker = cls.get_circuit_breaker()
+        circuit_breaker.before_call()
+
+        rate_limiter = cls.get_rate_limiter()
+        estimated_tokens = cls._estimate_tokens(prompt, system_prompt)
+        try:
+            await rate_limiter.acquire(estimated_tokens)
+        except BaseException:
+            # Cancelled while waiting for a slot, a half-open probe must not stay in flight
+            circuit_breaker.record_cancelled()
+            raise
+        actual_tokens = None
+        throttled = False
+        try:
+            stream = await client.models.generate_content_stream(
+                model=model_name,
+                contents=contents,
+                config=config,
+            )
+            async for chunk in stream:
+                if chunk.usage_metadata and chunk.usage_metadata.prompt_token_count:
+                    actual_tokens = chunk.usage_metadata.prompt_token_count
+                # Chunks carrying only thoughts or metadata have no text
+                if chunk.text:
+                    yield chunk.text
+        except Exception as e:
+            throttled = isinstance(e, APIError) and e.code == 429
+            circuit_breaker.record_error(e)
+            raise
+        except BaseException:
+            # Closed by the consumer or cancelled
+            circuit_breaker.record_cancelled()
+            raise
+        else:
+            circuit_breaker.record_success()
+        finally:
+            await rate_limiter.release(estimated_tokens, actual_tokens, throttled)
+
+    @staticmethod
+    def _is_hedging_enabled() -> bool:
+        return os.getenv("GENAI_HEDGING_ENABLED", "false").lower() == "true"
+
+    @classmethod
+    def get_hedger(cls) -> GenAIHedger:
+        if cls._hedger is None:
+            cls._hedger = GenAIHedger()
+        return cls._hedger
+
+    @classmethod
+    def get_circuit_breaker(cls) -> GenAICircuitBreaker:
+        if cls._circuit_breaker is None:
+            cls._circuit_breaker = GenAICircuitBreaker()
+        return cls._circuit_breaker
+
+    @classmethod
+    def get_health_status(cls) -> dict:
+        """
+        Derives GenAI health from the outcomes of recent real calls, without
+        calling Gemini. Status is "unknown" until the first call finished.
+        """
+        circuit_breaker = cls.get_circuit_breaker()
+        if circuit_breaker.state == GenAICircuitBreaker.OPEN:
+            status = "unhealthy"
+        elif circuit_breaker.consecutive_rejections >= circuit_breaker.failure_threshold:
+            # Gemini is up but rejects every call, e.g. a revoked API key or a wrong model name
+            status = "unhealthy"
+        elif (circuit_breaker.state == GenAICircuitBreaker.HALF_OPEN
+                or circuit_breaker.consecutive_failures
+                or circuit_breaker.consecutive_rejections):
+            status = "degraded"
+        elif circuit_breaker.last_success_at:
+            status = "healthy"
+        else:
+            status = "unknown"
+
+        return {
+            "status": status,
+            "circuit_breaker": circuit_breaker.stats(),
+            "last_error": circuit_breaker.last_error if status != "healthy" else None,
+        }
+
+    @classmethod
+    def get_rate_limiter(cls) -> GenAIRateLimiter:
+        if cls._rate_limiter is None:
+            cls._rate_limiter = GenAIRateLimiter()
+        return cls._rate_limiter
+
+    @staticmethod
+    def _estimate_tokens(prompt: str, system_prompt: str = None) -> int:
+        # Estimated before usage_metadata is known, a tokenizer call here would cost more than it saves
+        return TokenCounter.estimate(prompt) + TokenCounter.estimate(system_prompt or "")
+
+    @staticmethod
+    def _get_retry_delay(error: APIError, attempt: int) -> float:
+        """
+        Uses the retryDelay Gemini sends with a 429 when present, else exponential backoff.
+        """
+        details = error.details if isinstance(error.details, dict) else {}
+        for detail in details.get("error", {}).get("details", []) or []:
+            retry_delay = detail.get("retryDelay") if isinstance(detail, dict) else None
+            if retry_delay and retry_delay.endswith("s"):
+                try:
+                    return min(float(retry_delay[:-1]), GENAI_MAX_RETRY_DELAY_SECONDS)
+                except ValueError:
+                    pass
+        return min(2.0 ** attempt, GENAI_MAX_RETRY_DELAY_SECONDS)
+
+    @classmethod
+    def _get_batches(cls):
+        """
+        Returns the batch endpoint, or the local stand-in when GENAI_BATCH_BACKEND=local.
+        """
+        if os.getenv("GENAI_BATCH_BACKEND", "gemini").lower() == "local":
+            if cls._local_batches is None:
+                cls._local_batches = LocalGenAIBatches()
+            return cls._local_batches
+        return cls._get_client().batches
+
+    @classmethod
+    async def generate_batch(
+        cls,
+        requests: List[dict],
+        profile: str = DEFAULT_GENERATION_PROFILE
+    ) -> List[Optional[str]]:
+        """
+        Runs many generations through the Gemini Batch API instead of one
+        interactive call each.
+
+        Each request is a dict with `prompt` and optional `system_prompt` and
+        `response_schema`. Returns the response texts in request order, with
+        None for every request that did not produce a response. All requests
+        of one call share the `profile`, since a batch job runs a single model.
+        """
+        settings = cls.get_generation_settings(profile)
+        model_name = settings["model"]
+        max_requests = int(os.getenv("GENAI_BATCH_MAX_REQUESTS", GENAI_BATCH_MAX_REQUESTS))
+
+        inlined_requests = [
+            InlinedRequest(
+                model=model_name,
+                contents=[Content(role="user", parts=[Part.from_text(text=request["prompt"])])],
+                config=cls._build_config(
+                    request.get("system_prompt"), request.get("response_schema"), settings=settings
+                ),
+            )
+            for request in requests
+        ]
+        chunks = [
+            inlined_requests[i:i + max_requests]
+            for i in range(0, len(inlined_requests), max_requests)
+        ]
+
+        # Jobs for all chunks are submitted up front and polled concurrently
+        chunk_results = await asyncio.gather(
+            *[cls._run_batch_job(model_name, chunk) for chunk in chunks]
+        )
+        return [text for chunk_result in chunk_results for text in chunk_result]
+
+    @classmethod
+    async def _run_batch_job(cls, model_name: str, inlined_requests: List[InlinedRequest]) -> List[Optional[str]]:
+        batches = cls._get_batches()
+        poll_interval = float(os.getenv("GENAI_BATCH_POLL_SECONDS", GENAI_BATCH_POLL_SECONDS))
+        timeout = float(os.getenv("GENAI_BATCH_TIMEOUT_SECONDS", GENAI_BATCH_TIMEOUT_SECONDS))
+        empty_results: List[Optional[str]] = [None] * len(inlined_requests)
+
+        try:
+            batch_job = await batches.create(
+                model=model_name,
+                src=inlined_requests,
+                config=CreateBatchJobConfig(display_name=f"journal-run-{int(time.time())}"),
+            )
+            logger.info(f"Submitted batch job {batch_job.name} with {len(inlined_requests)} requests.")
+
+            deadline = time.monotonic() + timeout
+            while batch_job.state not in BATCH_TERMINAL_STATES:
+                if time.monotonic() >= deadline:
+                    logger.error(f"Batch job {batch_job.name} did not finish within {timeout} seconds.")
+                    return empty_results
+                await asyncio.sleep(poll_interval)
+                batch_job = await batches.get(name=batch_job.name)
+        except Exception as e:
+            logger.error(f"Error running batch job: {e}")
+            return empty_results
+
+        if batch_job.state not in (JobState.JOB_STATE_SUCCEEDED, JobState.JOB_STATE_PARTIALLY_SUCCEEDED):
+            logger.error(f"Batch job {batch_job.name} ended in state {batch_job.state}: {batch_job.error}")
+            return empty_results
+
+        inlined_responses = (batch_job.dest.inlined_responses if batch_job.dest else None) or []
+        results: List[Optional[str]] = []
+        for index in range(len(inlined_requests)):
+            inlined_response = inlined_responses[index] if index < len(inlined_responses) else None
+            if not inlined_response or inlined_response.error or not inlined_response.response:
+                results.append(None)
+                continue
+            try:
+                results.append(inlined_response.response.text)
+            except Exception as e:
+                logger.warning(f"Error reading batch response {index} of job {batch_job.name}: {e}")
+                results.append(None)
+
+        logger.info(
+            f"Batch job {batch_job.name} finished with "
+            f"{sum(1 for text in results if text)} of {len(results)} responses."
+        )
+        return results
+
     @classmethod
     async def generate_email_subject(cls, journal_entry: str, generated_reply: str) -> str:
         """
         Generates a catchy email subject based on the journal entry.
         """
         try:
-            # Use absolute path based on current file location
-            base_dir = Path(__file__).parent.parent
-            subject_prompt_path = base_dir / "prompts" / "email_subject_prompt.md"
-            system_prompt_path = base_dir / "prompts" / "email_subject_system_prompt.md"
-
-            with open(subject_prompt_path, "r", encoding="utf-8") as f:
-                user_prompt_template = f.read()
+            user_prompt_template = PromptRegistry.get("email_subject_prompt.md")
+            system_prompt = PromptRegistry.get_text("email_subject_system_prompt.md")
 
-            with open(system_prompt_path, "r", encoding="utf-8") as f:
-                system_prompt = f.read()
-            
-            prompt = user_prompt_template.replace("{{user_entry}}", journal_entry).replace("{{reply_generated}}", generated_reply)
+            prompt = user_prompt_template.render(user_entry=journal_entry, reply_generated=generated_reply)
 
-            subject = await cls.generate(prompt, system_prompt)
+            subject = await cls.generate(prompt, system_prompt, profile="subject")
             return subject.strip() if subject else "Your Daily Motivational Message"
         except Exception as e:
             logger.error(f"Error generating email subject: {e}")
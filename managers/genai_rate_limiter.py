@@ -0,0 +1,133 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from typing import Deque, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+GENAI_RPM_LIMIT = 1000
+GENAI_TPM_LIMIT = 1_000_000
+GENAI_MAX_CONCURRENCY = 16
+GENAI_MIN_CONCURRENCY = 1
+# Minimum seconds between two multiplicative decreases, so one burst of 429s halves the limit only once
+GENAI_BACKOFF_COOLDOWN_SECONDS = 5
+
+
+class _TokenBucket:
+    def __init__(self, capacity: float):
+        self.capacity = capacity
+        self.refill_per_second = capacity / 60
+        self.level = capacity
+        self.updated_at = time.monotonic()
+
+    def refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated_at) * self.refill_per_second)
+        self.updated_at = now
+
+    def seconds_until(self, amount: float) -> float:
+        # Requests larger than the bucket only wait for a full bucket
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.refill_per_second
+
+
+class GenAIRateLimiter:
+    """
+    Client-side limiter for Gemini requests-per-minute and tokens-per-minute quotas.
+
+    Calls are admitted against a request bucket and an input token bucket.
+    Token estimates are reconciled with `usage_metadata` once the call returns.
+    Concurrency is adjusted AIMD style: it grows by about one slot per round
+    of successful calls and is halved whenever Gemini answers with a 429.
+    """
+
+    def __init__(
+        self,
+        rpm_limit: Optional[int] = None,
+        tpm_limit: Optional[int] = None,
+        max_concurrency: Optional[int] = None
+    ):
+        self.rpm_limit = rpm_limit or int(os.getenv("GENAI_RPM_LIMIT", GENAI_RPM_LIMIT))
+        self.tpm_limit = tpm_limit or int(os.getenv("GENAI_TPM_LIMIT", GENAI_TPM_LIMIT))
+        self.max_concurrency = max_concurrency or int(os.getenv("GENAI_MAX_CONCURRENCY", GENAI_MAX_CONCURRENCY))
+        self.min_concurrency = GENAI_MIN_CONCURRENCY
+        self.concurrency_limit = float(self.max_concurrency)
+        self.in_flight = 0
+
+        self._requests = _TokenBucket(self.rpm_limit)
+        self._tokens = _TokenBucket(self.tpm_limit)
+        self._condition = asyncio.Condition()
+        self._last_backoff = 0.0
+        # (timestamp, tokens) of calls from the last minute, for the observed rates
+        self._recent_calls: Deque[Tuple[float, int]] = deque()
+        self.throttled_count = 0
+
+    async def acquire(self, estimated_tokens: int):
+        async with self._condition:
+            while True:
+                self._requests.refill()
+                self._tokens.refill()
+                if self.in_flight < int(self.concurrency_limit):
+                    wait = max(self._requests.seconds_until(1), self._tokens.seconds_until(estimated_tokens))
+                    if wait <= 0:
+                        self._requests.level -= 1
+                        self._tokens.level -= estimated_tokens
+                        self.in_flight += 1
+                        return
+                else:
+                    wait = None
+
+                # Woken early when a call finishes, otherwise when the buckets have refilled
+                try:
+                    await asyncio.wait_for(self._condition.wait(), timeout=wait)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def release(self, estimated_tokens: int, actual_tokens: Optional[int] = None, throttled: bool = False):
+        async with self._condition:
+            self.in_flight -= 1
+            now = time.monotonic()
+
+            if actual_tokens is not None:
+                # Correct the estimate, the bucket may go negative to repay an underestimate
+                self._tokens.refill()
+                self._tokens.level -= actual_tokens - estimated_tokens
+                self._recent_calls.append((now, actual_tokens))
+            else:
+                self._recent_calls.append((now, estimated_tokens))
+            while self._recent_calls and now - self._recent_calls[0][0] > 60:
+                self._recent_calls.popleft()
+
+            if throttled:
+                self.throttled_count += 1
+                if now - self._last_backoff >= GENAI_BACKOFF_COOLDOWN_SECONDS:
+                    self._last_backoff = now
+                    self.concurrency_limit = max(self.min_concurrency, self.concurrency_limit / 2)
+                    # Gemini says we are over quota, so stop admitting until the buckets refill a bit
+                    self._requests.level = min(self._requests.level, 0)
+                    logger.warning(
+                        f"Gemini rate limit hit, reducing concurrency to {int(self.concurrency_limit)}."
+                    )
+            else:
+                self.concurrency_limit = min(
+                    self.max_concurrency, self.concurrency_limit + 1 / self.concurrency_limit
+                )
+
+            self._condition.notify_all()
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        recent = [(ts, tokens) for ts, tokens in self._recent_calls if now - ts <= 60]
+        return {
+            "concurrency_limit": int(self.concurrency_limit),
+            "in_flight": self.in_flight,
+            "observed_rpm": len(recent),
+            "observed_tpm": sum(tokens for _, tokens in recent),
+            "rpm_limit": self.rpm_limit,
+            "tpm_limit": self.tpm_limit,
+            "throttled_count": self.throttled_count,
+        }
@@ -1,10 +1,17 @@
-from models.models import JournalEntry, Journal, User, NotionJournalEntry
+from models.models import JournalEntry, Journal, User, NotionJournalEntry, NotionUserRecord, JournalReply
 
 from managers.genai_manager import GenAIManager
+from google.genai.errors import APIError
+from managers.genai_cache import GenAIResponseCache
 from managers.email_manager import EmailManager
 from managers.notion_module.notion_manager import NotionManager
 from managers.notion_integration_manager import NotionIntegrationManager
+from managers.journal_sync_manager import JournalSyncManager
+from managers.user_manager import UserUpdateBuffer
 from exceptions.journal_exceptions import JournalDatabaseNotFound
+from exceptions.genai_exceptions import GenAICircuitOpenError
+from utils.prompt_registry import PromptRegistry
+from utils.token_counter import TokenCounter
 # from utils.database import get_db_connection
 
 import logging
@@ -12,18 +19,25 @@ import asyncio
 import json
 import random
 import os
-from pathlib import Path
+from datetime import datetime
+from typing import AsyncIterator, List, Optional, Tuple, Union
+from pydantic import ValidationError
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
 # Configuration constants
 GENAI_MAX_RETRIES = 1  # Number of retries for AI message generation
-MAX_JOURNAL_LENGTH = 2000  # Maximum length for journal content in prompt
+MAX_JOURNAL_TOKENS = 500  # Token budget for journal content in prompt, env MAX_JOURNAL_TOKENS overrides
+TRUNCATION_MARKER = "... (truncated)"
+JOURNAL_PROMPT_NAME = "journal_prompt_v3.md"
+SYSTEM_PROMPT_NAME = "system_prompt.md"
+COMBINED_REPLY_PROMPT_NAME = "journal_reply_with_subject_prompt.md"
 
 class JournalManager:
     def __init__(self):
         self.notion_integration_manager = NotionIntegrationManager()
+        self.journal_sync_manager = JournalSyncManager()
 
     #todo - refactor this to use async database connection of tortoise ORM
     @staticmethod
@@ -66,79 +80,94 @@ class JournalManager:
                 await conn.release()
 
     @staticmethod
-    def _truncate_journal_for_prompt(journal_content: NotionJournalEntry, max_length: int) -> str:
+    def _truncate_journal_for_prompt(journal_content: NotionJournalEntry, max_tokens: Optional[int] = None) -> str:
         """
-        Truncates journal content to a max length, ensuring valid JSON.
-        It proportionally shortens fields if the total length exceeds the limit.
+        Returns the journal entry as compact JSON whose field values fit in a
+        model token budget.
+
+        Fields shorter than an even share of the budget are kept whole and the
+        remaining budget is split across the longer fields, which are cut at a
+        word boundary. The result is kept on the entry, so the message, subject
+        and combined calls reuse one truncation.
         """
+        if max_tokens is None:
+            max_tokens = int(os.getenv("MAX_JOURNAL_TOKENS", MAX_JOURNAL_TOKENS))
+        if journal_content._prompt_json and journal_content._prompt_json[0] == max_tokens:
+            return journal_content._prompt_json[1]
+
         # Get the journal data as a dictionary, excluding empty fields
-        journal_data = journal_content.model_dump(exclude_none=True)
-        
-        content_values = [v for v in journal_data.values() if isinstance(v, str)]
-        content_len = sum(len(v) for v in content_values)
-    
-        if content_len > max_length:            
-            # Calculate how much we need to trim
-            overflow = content_len - max_length
-            
-            if content_len > 0:
-                # Trim each value proportionally
-                for key, value in journal_data.items():
-                    if isinstance(value, str):
-                        # Calculate how much to remove from this specific field
-                        proportion = len(value) / content_len
-                        # Subtract 18 to account for adding "... (truncated)"
-                        truncation_amount = int(overflow * proportion) + 18 
-                        
-                        if truncation_amount < len(value):
-                            new_len = len(value) - truncation_amount
-                            journal_data[key] = value[:new_len] + "... (truncated)"
-                        else:
-                            # If the field is too small to truncate meaningfully, keep it as it is
-                            journal_data[key] = value
-            
+        journal_data = {
+            key: value
+            for key, value in journal_content.model_dump(exclude_none=True).items()
+            if value
+        }
+        token_counts = {
+            key: TokenCounter.count(value)
+            for key, value in journal_data.items()
+            if isinstance(value, str)
+        }
+
+        if sum(token_counts.values()) > max_tokens:
+            marker_tokens = TokenCounter.count(TRUNCATION_MARKER)
+            remaining = max_tokens
+            # Smallest fields first, each gets at most an even share of what is left
+            by_size = sorted(token_counts, key=token_counts.get)
+            for index, key in enumerate(by_size):
+                allotment = min(token_counts[key], remaining // (len(by_size) - index))
+                remaining -= allotment
+                if allotment < token_counts[key]:
+                    truncated = TokenCounter.truncate(journal_data[key], allotment - marker_tokens)
+                    journal_data[key] = truncated + TRUNCATION_MARKER if truncated else ""
+
             # Remove any fields that became empty after truncation
             journal_data = {k: v for k, v in journal_data.items() if v}
 
-        # Create the final JSON prompt, pretty-printed
-        return json.dumps(journal_data, indent=2)
+        # Compact separators and raw unicode, indentation and escapes only cost input tokens
+        prompt_json = json.dumps(journal_data, ensure_ascii=False, separators=(",", ":"))
+        journal_content._prompt_json = (max_tokens, prompt_json)
+        return prompt_json
 
     @staticmethod
-    async def generate_motivational_message(journal_content: NotionJournalEntry) -> str:
-        final_prompt = JournalManager._truncate_journal_for_prompt(
-            journal_content, MAX_JOURNAL_LENGTH
-        )
-
+    def _load_message_prompts() -> Tuple[str, str]:
         try:
-            # Use absolute path based on current file location
-            base_dir = Path(__file__).parent.parent
-            journal_prompt_path = base_dir / "prompts" / "journal_prompt_v3.md"
-            system_prompt_path = base_dir / "prompts" / "system_prompt.md"
-            
-            with open(journal_prompt_path, "r", encoding="utf-8") as f:
-                user_prompt = f.read()
-
-            with open(system_prompt_path, "r", encoding="utf-8") as f:
-                system_prompt = f.read()
+            # Served from memory, files are only re-read when they change on disk
+            user_prompt = PromptRegistry.get_text(JOURNAL_PROMPT_NAME)
+            system_prompt = PromptRegistry.get_text(SYSTEM_PROMPT_NAME)
         except FileNotFoundError as e:
             logger.error(f"Prompt file not found: {e}")
             raise Exception(f"Required prompt file not found: {e}")
         except Exception as e:
             logger.error(f"Error reading prompt files: {e}")
             raise Exception(f"Error reading prompt files: {e}")
+        return user_prompt, system_prompt
+
+    @staticmethod
+    async def generate_motivational_message(journal_content: NotionJournalEntry) -> str:
+        final_prompt = JournalManager._truncate_journal_for_prompt(journal_content)
+
+        user_prompt, system_prompt = JournalManager._load_message_prompts()
+
+        # Identical input was already answered, e.g. on a re-triggered run
+        cache_key = JournalManager._generation_cache_key(
+            "message", [JOURNAL_PROMPT_NAME, SYSTEM_PROMPT_NAME], final_prompt
+        )
+        cached_message = await GenAIResponseCache.get(cache_key)
+        if cached_message:
+            logger.info("Using cached motivational message")
+            return cached_message
 
-        final_prompt = user_prompt + final_prompt
-        
         for attempt in range(GENAI_MAX_RETRIES + 1):  # Initial attempt + retries
             try:
-                message = await GenAIManager.generate(
-                    prompt=final_prompt, 
+                message = await JournalManager._generate_with_cached_prefix(
+                    prefix=user_prompt,
+                    suffix=final_prompt,
                     system_prompt=system_prompt
                 )
                 
                 # Check if message is empty or None
                 if message and message.strip():
                     logger.info(f"Successfully generated motivational message on attempt {attempt + 1}")
+                    await GenAIResponseCache.set(cache_key, message)
                     return message
                 else:
                     if attempt < GENAI_MAX_RETRIES:
@@ -149,6 +178,10 @@ class JournalManager:
                         logger.error(f"Generated message is empty or None after {GENAI_MAX_RETRIES + 1} attempts. Using fallback message.")
                         break
                         
+            except GenAICircuitOpenError as e:
+                # Gemini is known to be down, retrying would only delay the fallback
+                logger.warning(f"Skipping motivational message generation: {e}. Using fallback message.")
+                break
             except Exception as e:
                 if attempt < GENAI_MAX_RETRIES:
                     logger.warning(f"Error generating motivational message on attempt {attempt + 1}: {str(e)}. Retrying...")
@@ -167,74 +200,328 @@ class JournalManager:
         logger.info("Using fallback motivational message")
         return selected_fallback
 
-    async def process_and_email_user_journal(self, user: User):
+    @staticmethod
+    async def stream_motivational_message(journal_content: NotionJournalEntry) -> AsyncIterator[str]:
+        """
+        Yields the motivational message in chunks as the model produces it.
+
+        If the stream fails before its first chunk, the regular
+        generate_motivational_message path (retries, then static fallback) is
+        used and its message is yielded as a single chunk. A failure after the
+        first chunk is raised, since part of the message was already delivered.
+        """
+        journal_json = JournalManager._truncate_journal_for_prompt(journal_content)
+        user_prompt, system_prompt = JournalManager._load_message_prompts()
+
+        cache_key = JournalManager._generation_cache_key(
+            "message", [JOURNAL_PROMPT_NAME, SYSTEM_PROMPT_NAME], journal_json
+        )
+        cached_message = await GenAIResponseCache.get(cache_key)
+        if cached_message:
+            logger.info("Using cached motivational message")
+            yield cached_message
+            return
+
+        chunks: List[str] = []
         try:
-            # 1. Get Notion integration details for the user asynchronously
-            notion_integration = await self.notion_integration_manager.get_integration_by_user_id(user.id)
-            if not notion_integration:
-                logger.info(f"No Notion integration found for user {user.id}. Skipping.")
-                return {"status": "No Notion integration found", "message": None}
-            
-            # print(f"Notion integration found for user {user.id}: {notion_integration}")  # Debugging output
+            async for chunk in GenAIManager.generate_stream(
+                prompt=user_prompt + journal_json,
+                system_prompt=system_prompt
+            ):
+                chunks.append(chunk)
+                yield chunk
+        except Exception as e:
+            if chunks:
+                logger.error(f"Motivational message stream failed after {len(chunks)} chunks: {e}")
+                raise
+            logger.warning(f"Motivational message stream failed before the first chunk: {e}. Falling back.")
+
+        message = "".join(chunks)
+        if message.strip():
+            logger.info(f"Successfully streamed motivational message in {len(chunks)} chunks")
+            await GenAIResponseCache.set(cache_key, message)
+            return
+
+        yield await JournalManager.generate_motivational_message(journal_content)
+
+    @staticmethod
+    def is_combined_generation_enabled() -> bool:
+        return os.getenv("GENAI_COMBINED_GENERATION", "false").lower() == "true"
+
+    @staticmethod
+    async def generate_combined_reply(journal_content: NotionJournalEntry) -> Optional[JournalReply]:
+        """
+        Generates the motivational message and the email subject with a single
+        structured LLM call.
+
+        Returns None when combined generation is disabled or the response cannot
+        be parsed, in which case callers use the separate message and subject calls.
+        """
+        if not JournalManager.is_combined_generation_enabled():
+            return None
+
+        try:
+            request = JournalManager._build_combined_reply_request(journal_content)
+            cache_key = request.pop("cache_key")
+            cached_reply = JournalManager._parse_combined_reply(await GenAIResponseCache.get(cache_key))
+            if cached_reply:
+                logger.info("Using cached motivational message and subject")
+                return cached_reply
+
+            response_text = await JournalManager._generate_with_cached_prefix(
+                prefix=request["prompt_prefix"],
+                suffix=request["prompt"][len(request["prompt_prefix"]):],
+                system_prompt=request["system_prompt"],
+                response_schema=request["response_schema"]
+            )
+        except Exception as e:
+            logger.warning(f"Error generating combined reply, falling back to separate calls: {e}")
+            return None
+
+        reply = JournalManager._parse_combined_reply(response_text)
+        if reply:
+            logger.info("Successfully generated motivational message and subject in one call")
+            await GenAIResponseCache.set(cache_key, response_text)
+        return reply
+
+    @staticmethod
+    async def generate_replies_in_batch(journal_contents: List[NotionJournalEntry]) -> List[Optional[JournalReply]]:
+        """
+        Generates combined replies for many journal entries with one Gemini batch job.
+
+        Returns replies in input order, with None for entries whose batch result
+        is missing or invalid so callers can fall back to interactive calls.
+        """
+        replies: List[Optional[JournalReply]] = [None] * len(journal_contents)
+        requests = []
+        request_indexes = []
+        for index, journal_content in enumerate(journal_contents):
+            request = JournalManager._build_combined_reply_request(journal_content)
+            cached_reply = JournalManager._parse_combined_reply(await GenAIResponseCache.get(request["cache_key"]))
+            if cached_reply:
+                replies[index] = cached_reply
+            else:
+                requests.append(request)
+                request_indexes.append(index)
+
+        if not requests:
+            return replies
+
+        # Only cache misses are sent to the batch job
+        response_texts = await GenAIManager.generate_batch(
+            [
+                {key: value for key, value in request.items() if key not in ("cache_key", "prompt_prefix")}
+                for request in requests
+            ]
+        )
+        for index, request, response_text in zip(request_indexes, requests, response_texts):
+            replies[index] = JournalManager._parse_combined_reply(response_text)
+            if replies[index]:
+                await GenAIResponseCache.set(request["cache_key"], response_text)
+        return replies
 
-            notion_manager: NotionManager = NotionManager.get_manager_by_integration(notion_integration)
+    @staticmethod
+    def _build_combined_reply_request(journal_content: NotionJournalEntry) -> dict:
+        journal_json = JournalManager._truncate_journal_for_prompt(journal_content)
+        user_prompt = PromptRegistry.get_text(JOURNAL_PROMPT_NAME)
+        output_prompt = PromptRegistry.get_text(COMBINED_REPLY_PROMPT_NAME)
+        return {
+            "prompt": user_prompt + journal_json + "\n" + output_prompt,
+            "prompt_prefix": user_prompt,
+            "system_prompt": PromptRegistry.get_text(SYSTEM_PROMPT_NAME),
+            "response_schema": JournalReply,
+            "cache_key": JournalManager._generation_cache_key(
+                "combined",
+                [JOURNAL_PROMPT_NAME, SYSTEM_PROMPT_NAME, COMBINED_REPLY_PROMPT_NAME],
+                journal_json
+            ),
+        }
 
-            # 2. Fetch latest journal entry from Notion using user's credentials asynchronously
+    @staticmethod
+    async def _generate_with_cached_prefix(
+        prefix: str,
+        suffix: str,
+        system_prompt: str,
+        response_schema=None
+    ) -> str:
+        """
+        Generates from `prefix + suffix`, sending only the per-user suffix when the
+        static prefix and system prompt are held in a Gemini context cache.
+        """
+        cached_content = await GenAIManager.get_cached_prefix(prefix, system_prompt)
+        if cached_content:
             try:
-                journal_content = await notion_manager.get_latest_journal_entry(
-                    notion_token=notion_integration.access_token,
-                    database_id=notion_integration.page_id
+                return await GenAIManager.generate(
+                    prompt=suffix,
+                    response_schema=response_schema,
+                    cached_content=cached_content
                 )
-            except JournalDatabaseNotFound as e:
-                await self._handle_database_not_found(user)
-                return {"status": "Journal database not found", "message": None}
+            except APIError as e:
+                # The handle expired or was deleted, forget it and send the full prompt
+                if e.code not in (400, 403, 404):
+                    raise
+                logger.warning(f"Cached content {cached_content} rejected, sending full prompt: {e}")
+                GenAIManager.invalidate_cached_prefix(cached_content)
 
-            # print(f"Fetched journal content: {journal_content}")  # Debugging output
+        return await GenAIManager.generate(
+            prompt=prefix + suffix,
+            system_prompt=system_prompt,
+            response_schema=response_schema
+        )
 
+    @staticmethod
+    def _generation_cache_key(kind: str, prompt_names: List[str], journal_json: str) -> str:
+        return GenAIResponseCache.make_key(
+            kind=kind,
+            prompt_versions={name: PromptRegistry.get(name).version for name in prompt_names},
+            journal=journal_json,
+            generation=GenAIManager.get_generation_settings(),
+        )
+
+    @staticmethod
+    def _parse_combined_reply(response_text: Optional[str]) -> Optional[JournalReply]:
+        if not response_text:
+            return None
+        try:
+            reply = JournalReply.model_validate_json(response_text)
+        except ValidationError as e:
+            logger.warning(f"Combined reply could not be parsed, falling back to separate calls: {e}")
+            return None
+
+        if not reply.message.strip() or not reply.subject.strip():
+            logger.warning("Combined reply has an empty message or subject, falling back to separate calls.")
+            return None
+        return JournalReply(message=reply.message.strip(), subject=reply.subject.strip())
+
+    @staticmethod
+    async def generate_message_and_subject(journal_content: NotionJournalEntry) -> Tuple[str, Optional[str]]:
+        """
+        Returns the motivational message and email subject for a journal entry,
+        using one combined call when enabled and two separate calls otherwise.
+        """
+        reply = await JournalManager.generate_combined_reply(journal_content)
+        if reply:
+            return reply.message, reply.subject
+
+        motivational_message = await JournalManager.generate_motivational_message(journal_content)
+        if not motivational_message or not motivational_message.strip():
+            return motivational_message, None
+
+        email_subject = await JournalManager.generate_email_subject(journal_content, motivational_message)
+        return motivational_message, email_subject
+
+    async def process_and_email_user_journal(self, user: Union[User, NotionUserRecord]):
+        try:
+            # 1-2. Get the Notion integration and fetch the latest journal entry
+            fetch_result = await self.fetch_user_journal(user)
+            journal_content = fetch_result["journal_content"]
             if not journal_content:
-                user.inactive_days_counter += 1
-                await user.save(update_fields=["inactive_days_counter", "updated_at"])
-                logger.info(f"No journal entry for user {user.id} from the last 24 hours. Incremented inactive counter to {user.inactive_days_counter}.")
-                return {"status": "No journal entry found from the last 24 hours.", "message": None}
-
-            # If content is found, reset the counter if it's not already zero
-            if user.inactive_days_counter > 0:
-                user.inactive_days_counter = 0
-                await user.save(update_fields=["inactive_days_counter", "updated_at"])
-                logger.info(f"Journal entry found for user {user.id}. Reset inactive counter to 0.")
-
-            # 3. Generate motivational message asynchronously
-            motivational_message = await JournalManager.generate_motivational_message(journal_content)
+                return {"status": fetch_result["status"], "message": None}
+
+            # 3-4. Generate motivational message and email subject asynchronously
+            motivational_message, email_subject = await JournalManager.generate_message_and_subject(journal_content)
             
             # Validate that we have a valid message before sending email
             if not motivational_message or not motivational_message.strip():
                 logger.error(f"Generated message is empty or None for user {user.id}. Cannot send email.")
                 return {"status": "Failed to generate motivational message", "message": None}
-
-            # 4. Generate email subject asynchronously
-            journal_entry_str = JournalManager._truncate_journal_for_prompt(journal_content, MAX_JOURNAL_LENGTH)
-            email_subject = await GenAIManager.generate_email_subject(
-                journal_entry=journal_entry_str,
-                generated_reply=motivational_message
-            )
             
             # 5. Send email to the user asynchronously
-            await EmailManager.send_motivational_email(
-                user.id, 
-                user.email, 
-                motivational_message, 
-                subject=email_subject,
-                greeting="Hey,", 
-                salutation="Good morning!"
-            )
+            await self.send_journal_email(user, motivational_message, email_subject)
 
-            logger.info(f"Successfully processed and emailed journal for user {user.id} ({user.email})")
             return {"status": "Journal processed and email sent", "message": motivational_message}
         except Exception as e:
             logger.error(f"Error processing and emailing journal for user {user.id} ({user.email}): {e}")
             raise
 
-    async def _handle_database_not_found(self, user: User):
+    async def fetch_user_journal(
+        self,
+        user: Union[User, NotionUserRecord],
+        user_update_buffer: Optional[UserUpdateBuffer] = None
+    ) -> dict:
+        """
+        Fetches the user's latest journal entry from Notion, or from the local
+        mirror with JOURNAL_SOURCE=mirror, and updates their inactivity state.
+
+        When a `user_update_buffer` is given, inactivity updates are queued on it
+        instead of being written immediately.
+
+        Returns a dict with a `status` and the `journal_content`, which is None
+        whenever the user should not receive an email for this run.
+        """
+        # 1. Get Notion integration details, batch records already carry them
+        if isinstance(user, NotionUserRecord):
+            if user.integration_error:
+                raise Exception(user.integration_error)
+            notion_integration = user.notion_integration
+        else:
+            notion_integration = await self.notion_integration_manager.get_integration_by_user_id(user.id)
+        if not notion_integration:
+            logger.info(f"No Notion integration found for user {user.id}. Skipping.")
+            return {"status": "No Notion integration found", "journal_content": None}
+
+        # 2. Fetch latest journal entry from the synced mirror, or from Notion using user's credentials
+        try:
+            if JournalSyncManager.is_mirror_enabled():
+                journal_content = await self.journal_sync_manager.get_latest_journal_entry(
+                    user.id, notion_integration
+                )
+            else:
+                notion_manager: NotionManager = NotionManager.get_manager_by_integration(notion_integration)
+                journal_content = await notion_manager.get_latest_journal_entry(
+                    notion_token=notion_integration.access_token,
+                    database_id=notion_integration.page_id
+                )
+        except JournalDatabaseNotFound as e:
+            await self._handle_database_not_found(user, user_update_buffer)
+            return {"status": "Journal database not found", "journal_content": None}
+
+        if not journal_content:
+            user.inactive_days_counter += 1
+            if user_update_buffer:
+                await user_update_buffer.increment_inactive_days(user.id)
+            else:
+                await User.filter(id=user.id).update(
+                    inactive_days_counter=user.inactive_days_counter, updated_at=datetime.utcnow()
+                )
+            logger.info(f"No journal entry for user {user.id} from the last 24 hours. Incremented inactive counter to {user.inactive_days_counter}.")
+            return {"status": "No journal entry found from the last 24 hours.", "journal_content": None}
+
+        # If content is found, reset the counter if it's not already zero
+        if user.inactive_days_counter > 0:
+            user.inactive_days_counter = 0
+            if user_update_buffer:
+                await user_update_buffer.reset_inactive_days(user.id)
+            else:
+                await User.filter(id=user.id).update(inactive_days_counter=0, updated_at=datetime.utcnow())
+            logger.info(f"Journal entry found for user {user.id}. Reset inactive counter to 0.")
+
+        return {"status": "Journal entry found", "journal_content": journal_content}
+
+    @staticmethod
+    async def generate_email_subject(journal_content: NotionJournalEntry, motivational_message: str) -> str:
+        journal_entry_str = JournalManager._truncate_journal_for_prompt(journal_content)
+        return await GenAIManager.generate_email_subject(
+            journal_entry=journal_entry_str,
+            generated_reply=motivational_message
+        )
+
+    async def send_journal_email(self, user: Union[User, NotionUserRecord], motivational_message: str, email_subject: str):
+        await EmailManager.send_motivational_email(
+            user.id, 
+            user.email, 
+            motivational_message, 
+            subject=email_subject,
+            greeting="Hey,", 
+            salutation="Good morning!"
+        )
+        logger.info(f"Successfully processed and emailed journal for user {user.id} ({user.email})")
+
+    async def _handle_database_not_found(
+        self,
+        user: Union[User, NotionUserRecord],
+        user_update_buffer: Optional[UserUpdateBuffer] = None
+    ):
         """
         Handles the case when a user's journal database is not found by deactivating the user.
         """
@@ -242,8 +529,10 @@ class JournalManager:
             logger.info(
                 f"Database not found for user {user.id}. Deactivating user"
             )
-            user.is_active = False
-            await user.save(update_fields=["is_active", "updated_at"])
+            if user_update_buffer:
+                await user_update_buffer.deactivate(user.id)
+            else:
+                await User.filter(id=user.id).update(is_active=False, updated_at=datetime.utcnow())
         except Exception as e:
             logger.error(f"Error handling database not found for user {user.id}: {str(e)}")
             raise  
\ No newline at end of file
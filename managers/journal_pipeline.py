@@ -0,0 +1,287 @@
+import asyncio
+import logging
+import os
+import time
+from datetime import date
+from typing import AsyncIterator, Awaitable, Callable, List, Optional, Union
+
+from managers.genai_cache import GenAIResponseCache
+from managers.genai_manager import GenAIManager
+from managers.journal_manager import JournalManager
+from managers.notion_module.notion_manager import NotionManager
+from managers.run_ledger_manager import RunLedgerManager
+from managers.user_manager import UserUpdateBuffer
+from models.models import NotionJournalEntry, NotionUserRecord, User
+from utils.run_stats import RunStats
+
+logger = logging.getLogger(__name__)
+
+# Default per-stage concurrency when neither the stage nor BATCH_CONCURRENCY is configured
+DEFAULT_STAGE_CONCURRENCY = 5
+
+
+class JournalPipelineItem:
+    """
+    State carried by a single user through the pipeline stages.
+    """
+
+    def __init__(self, user: Union[User, NotionUserRecord]):
+        self.user = user
+        self.started_at = time.monotonic()
+        self.journal_content: Optional[NotionJournalEntry] = None
+        self.message: Optional[str] = None
+        self.subject: Optional[str] = None
+        self.status: Optional[str] = None
+        self.email_sent = False
+        # Set when another worker took over the user's ledger claim
+        self.claim_lost = False
+
+
+class PipelineStage:
+    """
+    A pool of workers running one step of the pipeline.
+
+    The handler returns True to forward the item to the next stage and False
+    to finish it early (e.g. the user has no journal entry today).
+
+    A stage with a `batch_handler` first collects every item of the run and
+    passes them to it in one call, then runs the per-item handler as usual.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        handler: Callable[[JournalPipelineItem], Awaitable[bool]],
+        concurrency: int,
+        batch_handler: Optional[Callable[[List[JournalPipelineItem]], Awaitable[None]]] = None
+    ):
+        self.name = name
+        self.handler = handler
+        self.batch_handler = batch_handler
+        self.concurrency = max(1, concurrency)
+        # Bounded input queue gives backpressure towards the previous stage
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=self.concurrency * 2)
+        self.stats = RunStats()
+
+
+class JournalPipeline:
+    """
+    Runs the nightly journal job as fetch -> generate -> subject -> send stages.
+
+    Each stage has its own worker pool and bounded input queue, so a slow
+    dependency only limits its own stage instead of the whole run.
+
+    In offline mode the generate stage waits for every fetched journal and
+    submits them as one Gemini batch job. Entries without a valid batch result
+    fall back to the interactive calls.
+    """
+
+    def __init__(
+        self,
+        journal_manager: JournalManager = None,
+        run_ledger_manager: Optional[RunLedgerManager] = None,
+        run_date: Optional[date] = None,
+        offline: bool = False,
+        worker_id: Optional[str] = None
+    ):
+        self.journal_manager = journal_manager or JournalManager()
+        # When a ledger is given, every finished user is recorded against run_date
+        self.run_ledger_manager = run_ledger_manager
+        self.run_date = run_date
+        # Set for users claimed from the ledger, their claim is checked before sending
+        self.worker_id = worker_id
+        # Inactivity updates are written in bulk instead of once per user
+        self.user_update_buffer = UserUpdateBuffer()
+        self.run_stats = RunStats()
+        self.stages = [
+            PipelineStage("fetch", self._fetch, self._get_concurrency("PIPELINE_FETCH_CONCURRENCY")),
+            PipelineStage(
+                "generate",
+                self._generate,
+                self._get_concurrency("PIPELINE_GENERATE_CONCURRENCY"),
+                batch_handler=self._generate_batch if offline else None
+            ),
+            PipelineStage("subject", self._subject, self._get_concurrency("PIPELINE_SUBJECT_CONCURRENCY")),
+            PipelineStage("send", self._send, self._get_concurrency("PIPELINE_EMAIL_CONCURRENCY")),
+        ]
+
+    @staticmethod
+    def _get_concurrency(env_name: str) -> int:
+        default = os.environ.get("BATCH_CONCURRENCY", DEFAULT_STAGE_CONCURRENCY)
+        return int(os.environ.get(env_name, default))
+
+    async def run(self, users: AsyncIterator[Union[User, NotionUserRecord]]) -> dict:
+        """
+        Feeds the users through every stage and returns the run summary.
+        """
+        stage_tasks = []
+        for index, stage in enumerate(self.stages):
+            next_stage = self.stages[index + 1] if index + 1 < len(self.stages) else None
+            stage_tasks.append(asyncio.create_task(self._run_stage(stage, next_stage)))
+
+        first_stage = self.stages[0]
+        try:
+            async for user in users:
+                await first_stage.queue.put(JournalPipelineItem(user))
+        finally:
+            for _ in range(first_stage.concurrency):
+                await first_stage.queue.put(None)
+            await asyncio.gather(*stage_tasks)
+            await self.user_update_buffer.flush()
+
+        return self.summary()
+
+    def summary(self) -> dict:
+        summary = self.run_stats.summary()
+        summary["stages"] = {stage.name: stage.stats.summary() for stage in self.stages}
+        summary["genai_cache"] = GenAIResponseCache.stats()
+        summary["genai_rate_limiter"] = GenAIManager.get_rate_limiter().stats()
+        summary["genai_hedging"] = GenAIManager.get_hedger().stats()
+        summary["genai_circuit_breaker"] = GenAIManager.get_circuit_breaker().stats()
+        summary["notion_rate_limiter"] = NotionManager.get_rate_limiter().stats()
+        return summary
+
+    async def _run_stage(self, stage: PipelineStage, next_stage: Optional[PipelineStage]):
+        if stage.batch_handler:
+            await self._run_batch_stage(stage, next_stage)
+        else:
+            workers = [
+                asyncio.create_task(self._stage_worker(stage, next_stage))
+                for _ in range(stage.concurrency)
+            ]
+            await asyncio.gather(*workers)
+
+        # Every worker of this stage is done, so shut down the next one
+        if next_stage:
+            for _ in range(next_stage.concurrency):
+                await next_stage.queue.put(None)
+
+    async def _run_batch_stage(self, stage: PipelineStage, next_stage: Optional[PipelineStage]):
+        # Drain the whole input first, the previous stage sends one sentinel per worker
+        items: List[JournalPipelineItem] = []
+        remaining_sentinels = stage.concurrency
+        while remaining_sentinels:
+            item = await stage.queue.get()
+            if item is None:
+                remaining_sentinels -= 1
+            else:
+                items.append(item)
+
+        if items:
+            try:
+                await stage.batch_handler(items)
+            except Exception as e:
+                # Items without a batch result are handled one by one below
+                logger.error(f"Batch handler of pipeline stage '{stage.name}' failed: {e}")
+
+        workers = [
+            asyncio.create_task(self._stage_worker(stage, next_stage))
+            for _ in range(stage.concurrency)
+        ]
+        for item in items:
+            await stage.queue.put(item)
+        for _ in workers:
+            await stage.queue.put(None)
+        await asyncio.gather(*workers)
+
+    async def _stage_worker(self, stage: PipelineStage, next_stage: Optional[PipelineStage]):
+        while True:
+            item: Optional[JournalPipelineItem] = await stage.queue.get()
+            if item is None:
+                return
+
+            started_at = time.monotonic()
+            try:
+                forward = await stage.handler(item)
+            except Exception as e:
+                # One failure must not stop the other users from being processed
+                logger.error(f"Pipeline stage '{stage.name}' failed for user {item.user.id}: {e}")
+                stage.stats.record(time.monotonic() - started_at, False)
+                await self._finish(item, success=False, error=f"{stage.name}: {e}")
+                continue
+
+            stage.stats.record(time.monotonic() - started_at, True)
+            if forward and next_stage:
+                await next_stage.queue.put(item)
+            else:
+                await self._finish(item, success=True)
+
+    async def _finish(self, item: JournalPipelineItem, success: bool, error: Optional[str] = None):
+        self.run_stats.record(time.monotonic() - item.started_at, success)
+        if not self.run_ledger_manager or item.claim_lost:
+            return
+
+        if not success:
+            status = RunLedgerManager.FAILED
+        elif item.email_sent:
+            status = RunLedgerManager.COMPLETED
+        else:
+            # Skipped users are not revisited, so their inactivity update must be written first
+            await self.user_update_buffer.defer(
+                lambda: self._record_status(item, RunLedgerManager.SKIPPED, error)
+            )
+            return
+        await self._record_status(item, status, error)
+
+    async def _record_status(self, item: JournalPipelineItem, status: str, error: Optional[str] = None):
+        try:
+            updated = await self.run_ledger_manager.mark_status(
+                self.run_date, item.user.id, status, error, worker_id=self.worker_id
+            )
+            if not updated:
+                logger.warning(
+                    f"Run ledger claim for user {item.user.id} is no longer held by worker "
+                    f"{self.worker_id}, status '{status}' not recorded."
+                )
+        except Exception as e:
+            logger.error(f"Failed to record run ledger status '{status}' for user {item.user.id}: {e}")
+
+    async def _fetch(self, item: JournalPipelineItem) -> bool:
+        fetch_result = await self.journal_manager.fetch_user_journal(item.user, self.user_update_buffer)
+        item.status = fetch_result["status"]
+        item.journal_content = fetch_result["journal_content"]
+        return item.journal_content is not None
+
+    async def _generate_batch(self, items: List[JournalPipelineItem]):
+        replies = await JournalManager.generate_replies_in_batch([item.journal_content for item in items])
+        for item, reply in zip(items, replies):
+            if reply:
+                item.message, item.subject = reply.message, reply.subject
+        logger.info(f"Batch generation produced replies for {sum(1 for reply in replies if reply)} of {len(items)} users.")
+
+    async def _generate(self, item: JournalPipelineItem) -> bool:
+        # Already generated by the batch job in offline mode
+        if item.message:
+            return True
+
+        # A combined reply fills in the subject as well, so the subject stage has nothing to do
+        reply = await JournalManager.generate_combined_reply(item.journal_content)
+        if reply:
+            item.message, item.subject = reply.message, reply.subject
+            return True
+
+        item.message = await JournalManager.generate_motivational_message(item.journal_content)
+        if not item.message or not item.message.strip():
+            item.status = "Failed to generate motivational message"
+            raise Exception("Generated message is empty or None. Cannot send email.")
+        return True
+
+    async def _subject(self, item: JournalPipelineItem) -> bool:
+        if item.subject is None:
+            item.subject = await JournalManager.generate_email_subject(item.journal_content, item.message)
+        return True
+
+    async def _send(self, item: JournalPipelineItem) -> bool:
+        # The item may have outlived its lease, e.g. while Gemini calls backed off, and been re-claimed
+        if self.worker_id and not await self.run_ledger_manager.renew_claim(
+            self.run_date, item.user.id, self.worker_id
+        ):
+            item.claim_lost = True
+            item.status = "Claim taken over by another worker, email not sent"
+            logger.warning(f"Worker {self.worker_id} lost the claim on user {item.user.id}, not sending the email.")
+            return False
+
+        await self.journal_manager.send_journal_email(item.user, item.message, item.subject)
+        item.status = "Journal processed and email sent"
+        item.email_sent = True
+        return True
@@ -0,0 +1,225 @@
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from exceptions.journal_exceptions import JournalPageReadIncomplete
+from managers.notion_module.notion_manager import NotionManager
+from models.models import (
+    NotionIntegrationPydantic,
+    NotionJournalEntry,
+    NotionJournalEntryRecord,
+    NotionSyncCursor,
+)
+
+logger = logging.getLogger(__name__)
+
+NOTION_SYNC_INITIAL_LOOKBACK_HOURS = 24  # How far back the first sync of a database reaches
+JOURNAL_LOOKBACK_HOURS = 24  # Same window as the live Notion query
+# Pages of one user whose body is read at the same time, they share the integration's rate limit
+NOTION_SYNC_PAGE_CONCURRENCY = 2
+# With webhooks, mirrors not synced for this long are synced before they are read, in case an event was missed
+NOTION_WEBHOOK_MAX_STALENESS_SECONDS = 24 * 60 * 60
+# Without webhooks, mirrors synced this recently are read as is, e.g. after /schedule/sync-notion-journals
+NOTION_SYNC_MAX_STALENESS_SECONDS = 15 * 60
+
+MIRRORED_FIELDS = ("entry_title", "gratitude", "highlights", "challenges", "reflection", "page_content")
+
+
+class JournalSyncManager:
+    """
+    Keeps a local mirror of each user's Notion journal pages.
+
+    Every sync asks Notion only for pages edited since the user's cursor (the
+    last seen `last_edited_time` and page id) and upserts them into
+    `notion_journal_entries`. With JOURNAL_SOURCE=mirror, the nightly run reads
+    journal entries from the mirror after such a delta sync, instead of
+    querying Notion for the latest page of every user.
+    """
+
+    @staticmethod
+    def is_mirror_enabled() -> bool:
+        return os.getenv("JOURNAL_SOURCE", "notion").lower() == "mirror"
+
+    @staticmethod
+    def _parse_time(value: str) -> datetime:
+        # Notion sends e.g. "2024-05-01T08:30:00.000Z"
+        return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+    @staticmethod
+    def _as_utc(value: datetime) -> datetime:
+        # The ORM returns naive UTC datetimes unless use_tz is enabled
+        return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+    async def sync_user(self, user_id: int, notion_integration: NotionIntegrationPydantic) -> int:
+        """
+        Fetches the pages changed since the user's cursor into the mirror and
+        advances the cursor. Returns the number of pages synced.
+
+        Pages whose body could not be read completely are not mirrored, and
+        the cursor stays before the first of them so the next sync retries.
+
+        Raises JournalDatabaseNotFound when the database is gone.
+        """
+        database_id = notion_integration.page_id
+        synced_at = datetime.now(timezone.utc)
+        cursor = await NotionSyncCursor.get_or_none(user_id=user_id)
+
+        if cursor and cursor.database_id == database_id and cursor.last_edited_time:
+            # Notion rounds last_edited_time to the minute, so pages at the cursor are fetched again and upserted
+            since = self._as_utc(cursor.last_edited_time)
+        else:
+            lookback_hours = float(os.getenv("NOTION_SYNC_INITIAL_LOOKBACK_HOURS", NOTION_SYNC_INITIAL_LOOKBACK_HOURS))
+            since = synced_at - timedelta(hours=lookback_hours)
+
+        notion_manager = NotionManager.get_manager_by_integration(notion_integration)
+        pages = await notion_manager.query_changed_pages(
+            notion_token=notion_integration.access_token,
+            database_id=database_id,
+            since=since,
+        )
+
+        ignored = [notion_manager.is_page_ignored(page) for page in pages]
+        semaphore = asyncio.Semaphore(int(os.getenv("NOTION_SYNC_PAGE_CONCURRENCY", NOTION_SYNC_PAGE_CONCURRENCY)))
+
+        incomplete_page_ids = set()
+
+        async def load_journal_entry(page: dict) -> Optional[NotionJournalEntry]:
+            # Bounded, so pages do not queue behind each other on the rate limit until their reads time out
+            async with semaphore:
+                try:
+                    return await notion_manager.load_journal_entry(
+                        notion_integration.access_token, page, allow_partial=False
+                    )
+                except JournalPageReadIncomplete as e:
+                    logger.warning(f"{e}, syncing the page again next time.")
+                    incomplete_page_ids.add(page["id"])
+                    return None
+
+        # Versions reading the page body fetch it here, ignored pages never reach a prompt
+        journal_entries = await asyncio.gather(*(
+            load_journal_entry(page)
+            for page, is_ignored in zip(pages, ignored)
+            if not is_ignored
+        ))
+        loaded_entries = iter(journal_entries)
+
+        records = []
+        # Pages come oldest edit first, the cursor advances to the last page before the first incomplete one
+        cursor_record = None
+        reached_incomplete_page = False
+        for page, is_ignored in zip(pages, ignored):
+            if is_ignored:
+                journal_entry = notion_manager.extract_journal_entry(page)
+            else:
+                journal_entry = next(loaded_entries)
+            if page["id"] in incomplete_page_ids:
+                # Not mirrored with partial text, the next sync reads the page again
+                reached_incomplete_page = True
+                continue
+            journal_entry = journal_entry or NotionJournalEntry()
+            records.append(NotionJournalEntryRecord(
+                user_id=user_id,
+                database_id=database_id,
+                page_id=page["id"],
+                is_ignored=is_ignored,
+                page_created_time=self._parse_time(page["created_time"]),
+                page_last_edited_time=self._parse_time(page["last_edited_time"]),
+                **journal_entry.model_dump(include=set(MIRRORED_FIELDS)),
+            ))
+            if not reached_incomplete_page:
+                cursor_record = records[-1]
+
+        try:
+            if records:
+                await NotionJournalEntryRecord.bulk_create(
+                    records,
+                    on_conflict=["user_id", "page_id"],
+                    update_fields=[*MIRRORED_FIELDS, "is_ignored", "page_last_edited_time", "updated_at"],
+                )
+
+            cursor_values = {"database_id": database_id}
+            if not incomplete_page_ids:
+                # The mirror only counts as synced when every changed page was read completely
+                cursor_values["synced_at"] = synced_at
+            if cursor_record:
+                cursor_values["last_edited_time"] = cursor_record.page_last_edited_time
+                cursor_values["last_page_id"] = cursor_record.page_id
+            elif not cursor or cursor.database_id != database_id:
+                cursor_values["last_edited_time"] = since
+                cursor_values["last_page_id"] = None
+            await NotionSyncCursor.update_or_create(defaults=cursor_values, user_id=user_id)
+            if not incomplete_page_ids:
+                # Changes reported after this sync started are not covered by it and stay pending
+                await NotionSyncCursor.filter(user_id=user_id, dirty_at__lte=synced_at).update(dirty_at=None)
+        except Exception as e:
+            raise Exception(f"Database error during journal sync for user {user_id}: {e}")
+
+        logger.info(f"Synced {len(records)} changed journal pages for user {user_id}.")
+        return len(records)
+
+    @staticmethod
+    async def mark_dirty(user_id: int):
+        """
+        Records that the user's Notion journal changed. The mirror is synced
+        before it is read until a sync started after this call succeeds, so a
+        failed or cancelled webhook sync is caught up by the nightly run.
+        """
+        try:
+            # Always moved forward, a change reported while a sync runs must outlive that sync's cleanup
+            await NotionSyncCursor.filter(user_id=user_id).update(dirty_at=datetime.now(timezone.utc))
+        except Exception as e:
+            raise Exception(f"Database error marking journal mirror of user {user_id} as dirty: {e}")
+
+    @staticmethod
+    def is_webhook_sync_enabled() -> bool:
+        return os.getenv("NOTION_WEBHOOKS_ENABLED", "false").lower() == "true"
+
+    async def is_fresh(self, user_id: int, notion_integration: NotionIntegrationPydantic) -> bool:
+        """
+        Returns whether the mirror can be read without a delta sync first.
+        """
+        cursor = await NotionSyncCursor.get_or_none(user_id=user_id)
+        if not cursor or cursor.database_id != notion_integration.page_id or not cursor.synced_at:
+            return False
+        if cursor.dirty_at:
+            return False
+        if self.is_webhook_sync_enabled():
+            # Webhook events report every change, so a clean mirror stays current without polling
+            max_staleness = float(
+                os.getenv("NOTION_WEBHOOK_MAX_STALENESS_SECONDS", NOTION_WEBHOOK_MAX_STALENESS_SECONDS)
+            )
+        else:
+            # Nothing reports a journal written since the sync, so only a recent one is trusted
+            max_staleness = float(os.getenv("NOTION_SYNC_MAX_STALENESS_SECONDS", NOTION_SYNC_MAX_STALENESS_SECONDS))
+        return datetime.now(timezone.utc) - self._as_utc(cursor.synced_at) <= timedelta(seconds=max_staleness)
+
+    async def get_latest_journal_entry(
+        self, user_id: int, notion_integration: NotionIntegrationPydantic
+    ) -> Optional[NotionJournalEntry]:
+        """
+        Reads the user's latest journal entry from the mirror, with the same
+        semantics as NotionManager.get_latest_journal_entry: the most recently
+        created page that was edited within the last JOURNAL_LOOKBACK_HOURS.
+
+        The pages changed since the last sync are fetched first, unless the
+        last sync is within NOTION_SYNC_MAX_STALENESS_SECONDS. With
+        NOTION_WEBHOOKS_ENABLED=true it is skipped while no webhook event is
+        pending and the last sync is within NOTION_WEBHOOK_MAX_STALENESS_SECONDS.
+        """
+        if not await self.is_fresh(user_id, notion_integration):
+            await self.sync_user(user_id, notion_integration)
+
+        edited_after = datetime.now(timezone.utc) - timedelta(hours=JOURNAL_LOOKBACK_HOURS)
+        try:
+            record = await NotionJournalEntryRecord.filter(
+                user_id=user_id,
+                database_id=notion_integration.page_id,
+                is_ignored=False,
+                page_last_edited_time__gte=edited_after,
+            ).order_by("-page_created_time").first()
+        except Exception as e:
+            raise Exception(f"Database error reading mirrored journal for user {user_id}: {e}")
+
+        return record.to_journal_entry() if record else None
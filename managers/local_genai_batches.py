@@ -0,0 +1,89 @@
+import itertools
+import json
+import logging
+from typing import Callable, Dict, List, Optional
+
+from google.genai.types import (
+    BatchJob,
+    BatchJobDestination,
+    Candidate,
+    Content,
+    CreateBatchJobConfig,
+    GenerateContentResponse,
+    InlinedRequest,
+    InlinedResponse,
+    JobState,
+    Part,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def default_local_responder(request: InlinedRequest) -> str:
+    """
+    Returns a placeholder response, shaped as JSON when the request asks for it.
+    """
+    config = request.config
+    if config is not None and config.response_mime_type == "application/json":
+        return json.dumps({
+            "message": "This is a locally generated batch reply.",
+            "subject": "Local batch subject",
+        })
+    return "This is a locally generated batch reply."
+
+
+class LocalGenAIBatches:
+    """
+    Offline stand-in for the Gemini batch endpoint (`client.aio.batches`).
+
+    Jobs are answered by `responder` without any network call and report
+    JOB_STATE_RUNNING for `polls_until_done` polls before they succeed, so the
+    submit/poll/fan-out path can be exercised locally with GENAI_BATCH_BACKEND=local.
+    """
+
+    def __init__(
+        self,
+        responder: Callable[[InlinedRequest], Optional[str]] = default_local_responder,
+        polls_until_done: int = 1
+    ):
+        self.responder = responder
+        self.polls_until_done = polls_until_done
+        self._jobs: Dict[str, dict] = {}
+        self._job_ids = itertools.count(1)
+
+    async def create(
+        self,
+        *,
+        model: str,
+        src: List[InlinedRequest],
+        config: Optional[CreateBatchJobConfig] = None
+    ) -> BatchJob:
+        name = f"batches/local-{next(self._job_ids)}"
+        self._jobs[name] = {"model": model, "requests": list(src), "polls": 0}
+        logger.info(f"Local batch job {name} created with {len(src)} requests.")
+        return BatchJob(name=name, model=model, state=JobState.JOB_STATE_PENDING)
+
+    async def get(self, *, name: str) -> BatchJob:
+        job = self._jobs[name]
+        job["polls"] += 1
+        if job["polls"] < self.polls_until_done:
+            return BatchJob(name=name, model=job["model"], state=JobState.JOB_STATE_RUNNING)
+
+        inlined_responses = []
+        for request in job["requests"]:
+            text = self.responder(request)
+            if text is None:
+                inlined_responses.append(InlinedResponse())
+                continue
+            inlined_responses.append(InlinedResponse(
+                response=GenerateContentResponse(candidates=[
+                    Candidate(content=Content(role="model", parts=[Part(text=text)]))
+                ])
+            ))
+
+        return BatchJob(
+            name=name,
+            model=job["model"],
+            state=JobState.JOB_STATE_SUCCEEDED,
+            dest=BatchJobDestination(inlined_responses=inlined_responses),
+        )
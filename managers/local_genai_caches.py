@@ -0,0 +1,62 @@
+import itertools
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+
+from google.genai.types import (
+    CachedContent,
+    CreateCachedContentConfig,
+    DeleteCachedContentResponse,
+    UpdateCachedContentConfig,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _ttl_seconds(ttl: Optional[str]) -> float:
+    # The API takes durations such as "3600s"
+    return float(ttl[:-1]) if ttl and ttl.endswith("s") else 3600.0
+
+
+class LocalGenAICaches:
+    """
+    Offline stand-in for the Gemini cached content endpoint (`client.aio.caches`).
+
+    Handles are kept in memory together with their contents, so GenAIManager
+    can expand a handle into the full request itself when
+    GENAI_CONTEXT_CACHE_BACKEND=local.
+    """
+
+    def __init__(self):
+        self._entries: Dict[str, dict] = {}
+        self._cache_ids = itertools.count(1)
+
+    async def create(self, *, model: str, config: CreateCachedContentConfig) -> CachedContent:
+        name = f"cachedContents/local-{next(self._cache_ids)}"
+        expire_time = datetime.now(timezone.utc) + timedelta(seconds=_ttl_seconds(config.ttl))
+        self._entries[name] = {
+            "model": model,
+            "contents": config.contents,
+            "system_instruction": config.system_instruction,
+            "expire_time": expire_time,
+        }
+        logger.info(f"Local cached content {name} created.")
+        return CachedContent(name=name, model=model, expire_time=expire_time)
+
+    async def update(self, *, name: str, config: UpdateCachedContentConfig) -> CachedContent:
+        entry = self._entries[name]
+        entry["expire_time"] = datetime.now(timezone.utc) + timedelta(seconds=_ttl_seconds(config.ttl))
+        return CachedContent(name=name, model=entry["model"], expire_time=entry["expire_time"])
+
+    async def delete(self, *, name: str) -> DeleteCachedContentResponse:
+        self._entries.pop(name, None)
+        return DeleteCachedContentResponse()
+
+    def resolve(self, name: str) -> Optional[dict]:
+        """
+        Returns the stored contents and system instruction of a live handle.
+        """
+        entry = self._entries.get(name)
+        if not entry or entry["expire_time"] <= datetime.now(timezone.utc):
+            return None
+        return entry
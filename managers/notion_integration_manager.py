@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 
 from models.models import NotionIntegration, NotionIntegrationPydantic
@@ -28,4 +28,19 @@ class NotionIntegrationManager:
                 return integration.to_pydantic()
             return None
         except Exception as e:
-            raise Exception(f"Database error fetching Notion integration by user ID: {e}")
\ No newline at end of file
+            raise Exception(f"Database error fetching Notion integration by user ID: {e}")
+
+    async def get_integrations_by_page_id(self, page_id: str) -> List[NotionIntegrationPydantic]:
+        try:
+            # Notion ids appear both with and without dashes
+            undashed_id = page_id.replace("-", "")
+            dashed_id = "-".join([
+                undashed_id[:8], undashed_id[8:12], undashed_id[12:16], undashed_id[16:20], undashed_id[20:]
+            ])
+            integrations = await NotionIntegration.filter(page_id__in=[undashed_id, dashed_id])
+
+            for integration in integrations:
+                integration.access_token = decrypt_data(integration.access_token)
+            return [integration.to_pydantic() for integration in integrations]
+        except Exception as e:
+            raise Exception(f"Database error fetching Notion integrations by page ID: {e}")
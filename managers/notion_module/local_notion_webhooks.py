@@ -0,0 +1,55 @@
+import hashlib
+import hmac
+import json
+import uuid
+from datetime import datetime, timezone
+from typing import Optional
+
+import httpx
+
+
+class LocalNotionWebhookSimulator:
+    """
+    Offline stand-in for Notion's webhook delivery.
+
+    Builds page events shaped like the ones Notion sends and posts them to the
+    `/notion/webhook` route signed with `verification_token`, so the receiver
+    can be exercised against the app (e.g. through httpx.ASGITransport)
+    without a public endpoint or a real subscription.
+    """
+
+    def __init__(self, verification_token: str, path: str = "/notion/webhook"):
+        self.verification_token = verification_token
+        self.path = path
+
+    @staticmethod
+    def page_event(
+        page_id: str,
+        database_id: str,
+        event_type: str = "page.content_updated",
+        event_id: Optional[str] = None,
+    ) -> dict:
+        return {
+            "id": event_id or str(uuid.uuid4()),
+            "timestamp": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
+            "type": event_type,
+            "entity": {"id": page_id, "type": "page"},
+            "data": {"parent": {"id": database_id, "type": "database"}},
+        }
+
+    def sign(self, body: bytes) -> str:
+        return "sha256=" + hmac.new(self.verification_token.encode("utf-8"), body, hashlib.sha256).hexdigest()
+
+    async def deliver(self, client: httpx.AsyncClient, event: dict, signature: Optional[str] = None) -> httpx.Response:
+        """
+        Posts `event` to the webhook route. Pass `signature` to send a forged one.
+        """
+        body = json.dumps(event).encode("utf-8")
+        return await client.post(
+            self.path,
+            content=body,
+            headers={
+                "Content-Type": "application/json",
+                "X-Notion-Signature": signature if signature is not None else self.sign(body),
+            },
+        )
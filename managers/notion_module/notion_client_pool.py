@@ -0,0 +1,68 @@
+import logging
+import os
+from typing import Optional
+
+import httpx
+from notion_client import AsyncClient
+
+logger = logging.getLogger(__name__)
+
+NOTION_MAX_CONNECTIONS = 20
+NOTION_MAX_KEEPALIVE_CONNECTIONS = 10
+NOTION_KEEPALIVE_EXPIRY_SECONDS = 30
+
+try:
+    import h2  # noqa: F401
+
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+class NotionClientPool:
+    """
+    Process-wide Notion client over one pooled httpx connection pool.
+
+    The client carries no token, callers pass the user's token with each
+    request (`auth=`), so every user shares the same keep-alive connections
+    instead of paying a new TCP/TLS handshake per fetch. It is opened on app
+    startup and closed on shutdown, and created lazily for scripts that use
+    it without the app.
+    """
+
+    _client: Optional[AsyncClient] = None
+
+    @classmethod
+    def _create_client(cls) -> AsyncClient:
+        limits = httpx.Limits(
+            max_connections=int(os.getenv("NOTION_MAX_CONNECTIONS", NOTION_MAX_CONNECTIONS)),
+            max_keepalive_connections=int(
+                os.getenv("NOTION_MAX_KEEPALIVE_CONNECTIONS", NOTION_MAX_KEEPALIVE_CONNECTIONS)
+            ),
+            keepalive_expiry=float(os.getenv("NOTION_KEEPALIVE_EXPIRY_SECONDS", NOTION_KEEPALIVE_EXPIRY_SECONDS)),
+        )
+        # HTTP/2 multiplexes concurrent requests over one connection, it needs the optional h2 package
+        http2 = HTTP2_AVAILABLE and os.getenv("NOTION_HTTP2", "true").lower() == "true"
+        http_client = httpx.AsyncClient(limits=limits, http2=http2)
+        logger.info(
+            f"Opened Notion connection pool (max_connections={limits.max_connections}, http2={http2})."
+        )
+        return AsyncClient(client=http_client)
+
+    @classmethod
+    async def open(cls):
+        if cls._client is None:
+            cls._client = cls._create_client()
+
+    @classmethod
+    def get(cls) -> AsyncClient:
+        if cls._client is None:
+            cls._client = cls._create_client()
+        return cls._client
+
+    @classmethod
+    async def close(cls):
+        if cls._client is not None:
+            client, cls._client = cls._client, None
+            await client.aclose()
+            logger.info("Closed Notion connection pool.")
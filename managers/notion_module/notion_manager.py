@@ -1,11 +1,15 @@
 import os
-from notion_client import AsyncClient, APIResponseError, APIErrorCode
+from notion_client import APIResponseError, APIErrorCode
 import logging
 from datetime import datetime, time, timezone, timedelta
 import httpx
 import base64
+from typing import List, Optional
 
 from managers.notion_integration_manager import NotionIntegrationManager
+from managers.notion_module.notion_client_pool import NotionClientPool
+from managers.notion_module.notion_property_schema import NotionPropertySchema
+from managers.notion_module.notion_rate_limiter import NotionRateLimiter
 from managers.user_manager import UserManager
 from models.models import NotionIntegration
 from utils.utils import create_access_token  # Import create_access_token
@@ -14,16 +18,37 @@ from exceptions.journal_exceptions import JournalDatabaseNotFound
 
 logger = logging.getLogger(__name__)
 
+NOTION_QUERY_PAGE_SIZE = 100  # Maximum page size of the Notion API
+NOTION_SYNC_MAX_PAGES = 1000  # Pages fetched per sync, env NOTION_SYNC_MAX_PAGES overrides
+
 
 class NotionManager:
     NOTION_CLIENT_ID = os.getenv("NOTION_CLIENT_ID")
     NOTION_CLIENT_SECRET = os.getenv("NOTION_CLIENT_SECRET")
     NOTION_REDIRECT_URI = os.getenv("NOTION_REDIRECT_URI")
 
+    # Journal properties of this version's template, compiled once per class
+    PROPERTY_SCHEMA = NotionPropertySchema({
+        "Entry Title": ("entry_title", "title"),
+        "Gratitude": ("gratitude", "rich_text"),
+        "Highlights": ("highlights", "rich_text"),
+        "Challenges": ("challenges", "rich_text"),
+        "Reflection": ("reflection", "rich_text"),
+    })
+
+    # Shared by all manager instances, so every fetch counts against the same quotas
+    _rate_limiter = None
+
     def __init__(self):
         self.notion_integration_manager = NotionIntegrationManager()
         self.user_manager = UserManager()
 
+    @classmethod
+    def get_rate_limiter(cls) -> NotionRateLimiter:
+        if NotionManager._rate_limiter is None:
+            NotionManager._rate_limiter = NotionRateLimiter()
+        return NotionManager._rate_limiter
+
     async def get_latest_journal_entry(
         self, notion_token: str, database_id: str
     ) -> NotionJournalEntry | None:
@@ -31,11 +56,9 @@ class NotionManager:
             if not notion_token or not database_id:
                 raise Exception("Notion token or database ID not provided.")
 
-            notion = AsyncClient(auth=notion_token)
-
-            # Query the database
-            response = await notion.databases.query(
-                database_id=database_id,
+            response = await self._query_database(
+                notion_token,
+                database_id,
                 sorts=[
                     {
                         "timestamp": "created_time",
@@ -46,35 +69,7 @@ class NotionManager:
                 page_size=1,
             )
             if response["results"]:
-                latest_journal_page = response["results"][0]
-
-                journal_data = {}
-                properties = latest_journal_page["properties"]
-
-                # Extract Entry Title
-                entry_title = properties.get("Entry Title", {}).get("title", [])
-                if entry_title:
-                    title_text = entry_title[0].get("plain_text", "")
-                    if title_text:
-                        journal_data["entry_title"] = title_text
-
-                # Extract rich text properties
-                rich_text_properties = [
-                    "Gratitude",
-                    "Highlights",
-                    "Challenges",
-                    "Reflection",
-                ]
-                for prop_name in rich_text_properties:
-                    prop_data = properties.get(prop_name, {}).get("rich_text", [])
-                    if prop_data:
-                        content_text = "".join(
-                            [text_obj.get("plain_text", "") for text_obj in prop_data]
-                        )
-                        if content_text:
-                            journal_data[prop_name.lower()] = content_text
-
-                return NotionJournalEntry(**journal_data) if journal_data else None
+                return await self.load_journal_entry(notion_token, response["results"][0])
             else:
                 return None
 
@@ -91,6 +86,100 @@ class NotionManager:
             logger.error(f"Error fetching from Notion database {database_id}: {e}")
             raise Exception(f"Failed to fetch latest journal entry: {str(e)}")
 
+    async def query_changed_pages(
+        self, notion_token: str, database_id: str, since: datetime
+    ) -> List[dict]:
+        """
+        Returns the pages of the journal database edited on or after `since`,
+        oldest edit first, following Notion's pagination.
+        """
+        try:
+            max_pages = int(os.getenv("NOTION_SYNC_MAX_PAGES", NOTION_SYNC_MAX_PAGES))
+            pages: List[dict] = []
+            start_cursor = None
+            while True:
+                query_params = {
+                    "sorts": [{"timestamp": "last_edited_time", "direction": "ascending"}],
+                    "filter": self.get_sync_filter_payload(since),
+                    "page_size": NOTION_QUERY_PAGE_SIZE,
+                }
+                if start_cursor:
+                    query_params["start_cursor"] = start_cursor
+                response = await self._query_database(notion_token, database_id, **query_params)
+                pages.extend(response["results"])
+                if not response.get("has_more") or len(pages) >= max_pages:
+                    # Anything beyond the cap is picked up by the next sync, which starts after these pages
+                    return pages[:max_pages]
+                start_cursor = response.get("next_cursor")
+
+        except APIResponseError as e:
+            if e.status == 404 and e.code == APIErrorCode.ObjectNotFound:
+                logger.warning(f"Journal database not found. Error: {str(e)}")
+                raise JournalDatabaseNotFound(
+                    message=f"Database not found or access denied: {str(e)}",
+                )
+            else:
+                logger.error(f"API error while syncing data from notion: Status {e.status}, Code: {e.code}, Message: {str(e)}")
+                raise
+        except Exception as e:
+            logger.error(f"Error syncing from Notion database {database_id}: {e}")
+            raise Exception(f"Failed to sync journal entries: {str(e)}")
+
+    async def _query_database(self, notion_token: str, database_id: str, **query_params) -> dict:
+        """
+        Queries the database through the shared client within the integration's
+        rate limit, asking only for the properties of PROPERTY_SCHEMA once
+        their ids are known.
+        """
+        # Shared pooled client, the user's token is sent with the request
+        notion = NotionClientPool.get()
+        filter_properties = self.PROPERTY_SCHEMA.get_filter_properties(database_id)
+        if filter_properties:
+            query_params["filter_properties"] = filter_properties
+
+        try:
+            response = await self.get_rate_limiter().call(
+                notion_token,
+                lambda: notion.databases.query(database_id=database_id, auth=notion_token, **query_params),
+            )
+        except APIResponseError as e:
+            if not filter_properties or e.code != APIErrorCode.ValidationError:
+                raise
+            # The remembered ids are stale, e.g. a property was deleted, ask for every property again
+            logger.info(f"Notion rejected the property ids of database {database_id}, querying all properties.")
+            self.PROPERTY_SCHEMA.forget_property_ids(database_id)
+            query_params.pop("filter_properties")
+            response = await self.get_rate_limiter().call(
+                notion_token,
+                lambda: notion.databases.query(database_id=database_id, auth=notion_token, **query_params),
+            )
+            filter_properties = None
+
+        if response["results"] and not filter_properties:
+            self.PROPERTY_SCHEMA.remember_property_ids(database_id, response["results"][0])
+        return response
+
+    def extract_journal_entry(self, page: dict) -> Optional[NotionJournalEntry]:
+        return self.PROPERTY_SCHEMA.extract(page)
+
+    async def load_journal_entry(
+        self, notion_token: str, page: dict, allow_partial: bool = True
+    ) -> Optional[NotionJournalEntry]:
+        """
+        Returns the journal entry of a queried page. Versions that read more
+        than the page's properties override this.
+
+        Those raise JournalPageReadIncomplete when the rest of the page could
+        not be read completely, unless `allow_partial` accepts what was read.
+        """
+        return self.extract_journal_entry(page)
+
+    def is_page_ignored(self, page: dict) -> bool:
+        """
+        Returns whether the user excluded the page from their journal.
+        """
+        return self.PROPERTY_SCHEMA.is_ignored(page)
+
     async def _exchange_code_for_token(self, auth_code: str) -> dict:
         try:
             client_id = self.NOTION_CLIENT_ID
@@ -161,7 +250,7 @@ class NotionManager:
             user_id=user.id,
             access_token=access_token,
             page_id=duplicated_template_id,
-            version="v2",
+            version="v3",
         )
 
         app_access_token = create_access_token(data={"sub": str(user.id)})
@@ -185,6 +274,13 @@ class NotionManager:
             ]
         }
 
+    def get_sync_filter_payload(self, since: datetime):
+        # No property filters, so pages the user later excludes are synced and marked as ignored
+        return {
+            "timestamp": "last_edited_time",
+            "last_edited_time": {"on_or_after": since.isoformat()},
+        }
+
     @classmethod
     def get_manager_by_integration(
         cls, integration: NotionIntegration
@@ -193,8 +289,11 @@ class NotionManager:
         Returns the NotionManager instance for the given integration.
         """
         from .notion_manager_v2 import NotionManagerV2
+        from .notion_manager_v3 import NotionManagerV3
 
-        if integration.version == "v2":
+        if integration.version == "v3":
+            return NotionManagerV3()
+        elif integration.version == "v2":
             return NotionManagerV2()
         else:
             return NotionManager()
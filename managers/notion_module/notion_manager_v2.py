@@ -1,9 +1,15 @@
 from datetime import datetime, timezone, timedelta
 
 from .notion_manager import NotionManager
+from .notion_property_schema import NotionPropertySchema
 
 
 class NotionManagerV2(NotionManager):
+    PROPERTY_SCHEMA = NotionPropertySchema(
+        NotionManager.PROPERTY_SCHEMA.fields,
+        ignore_property="Ignore Entry",
+    )
+
     def get_filter_payload(self):
         # Calculate timestamp for 24 hours ago
         last_24_hours = datetime.now(timezone.utc) - timedelta(hours=24)
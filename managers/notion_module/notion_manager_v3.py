@@ -0,0 +1,183 @@
+import asyncio
+import logging
+import os
+from typing import Callable, Dict, List, Optional
+
+from exceptions.journal_exceptions import JournalPageReadIncomplete
+from utils.token_counter import TokenCounter
+from models.models import NotionJournalEntry
+
+from .notion_client_pool import NotionClientPool
+from .notion_manager import NOTION_QUERY_PAGE_SIZE
+from .notion_manager_v2 import NotionManagerV2
+
+logger = logging.getLogger(__name__)
+
+NOTION_BLOCK_MAX_DEPTH = 3  # Nesting levels below the page whose blocks are read
+NOTION_PAGE_CONTENT_TIMEOUT_SECONDS = 10  # Reading stops here, the read is incomplete
+
+# Blocks whose children are separate pages or databases, not part of the entry
+SKIPPED_CHILD_TYPES = ("child_page", "child_database", "link_to_page")
+LIST_ITEM_TYPES = ("bulleted_list_item", "numbered_list_item")
+
+
+class _PageContent:
+    """
+    Blocks fetched so far for one page, kept outside the fetch tasks so a
+    timed-out read still returns what arrived.
+    """
+
+    def __init__(self, page_id: str, max_tokens: int, on_started: Optional[Callable[[], None]] = None):
+        self.page_id = page_id
+        self.max_tokens = max_tokens
+        self.children: Dict[str, List[dict]] = {}
+        self.tokens = 0
+        self._on_started = on_started
+
+    def mark_started(self):
+        # Called once a request got its rate limit slot, the first call starts the read's timeout
+        if self._on_started:
+            on_started, self._on_started = self._on_started, None
+            on_started()
+
+    def is_full(self) -> bool:
+        return self.tokens >= self.max_tokens
+
+    def add(self, parent_id: str, blocks: List[dict]):
+        self.children.setdefault(parent_id, []).extend(blocks)
+        for block in blocks:
+            self.tokens += TokenCounter.estimate(block_text(block))
+
+    def render(self) -> str:
+        # Document order, the blocks were fetched level by level
+        lines = []
+        stack = list(reversed(self.children.get(self.page_id, [])))
+        while stack:
+            block = stack.pop()
+            text = block_text(block)
+            if text:
+                lines.append(text)
+            stack.extend(reversed(self.children.get(block["id"], [])))
+        return TokenCounter.truncate("\n".join(lines), self.max_tokens)
+
+
+def block_text(block: dict) -> str:
+    block_type = block.get("type")
+    value = block.get(block_type) or {}
+    if block_type == "table_row":
+        return " | ".join(
+            "".join([text_obj.get("plain_text", "") for text_obj in cell]) for cell in value.get("cells", [])
+        )
+
+    text = "".join([text_obj.get("plain_text", "") for text_obj in value.get("rich_text") or ()])
+    if not text:
+        return ""
+    if block_type in LIST_ITEM_TYPES:
+        return f"- {text}"
+    if block_type == "to_do":
+        return f"[{'x' if value.get('checked') else ' '}] {text}"
+    return text
+
+
+class NotionManagerV3(NotionManagerV2):
+    """
+    Reads the page body along with the database properties, for users who
+    write their journal in the page itself.
+
+    Blocks are read breadth first down to NOTION_BLOCK_MAX_DEPTH, the blocks
+    of one level concurrently through the integration's rate limiter. Reading
+    stops once the text fills the journal prompt budget or after
+    NOTION_PAGE_CONTENT_TIMEOUT_SECONDS, so long pages cost a bounded number
+    of requests. The timeout starts once the first request is sent, so time
+    spent queued on the integration's rate limit before that does not count.
+    """
+
+    async def load_journal_entry(
+        self, notion_token: str, page: dict, allow_partial: bool = True
+    ) -> Optional[NotionJournalEntry]:
+        journal_entry = self.extract_journal_entry(page)
+        try:
+            page_content = await self.get_page_content(notion_token, page["id"])
+        except JournalPageReadIncomplete as e:
+            if not allow_partial:
+                raise
+            logger.warning(f"{e}, using the text read so far.")
+            page_content = e.page_content
+        if not page_content:
+            return journal_entry
+        if journal_entry is None:
+            return NotionJournalEntry(page_content=page_content)
+        return journal_entry.model_copy(update={"page_content": page_content})
+
+    async def get_page_content(self, notion_token: str, page_id: str, max_tokens: Optional[int] = None) -> str:
+        """
+        Returns the plain text of the page body, at most `max_tokens` long.
+
+        Raises JournalPageReadIncomplete, with the text read so far, when
+        reading times out or a request fails.
+        """
+        if max_tokens is None:
+            # The page body cannot take more than the whole journal prompt budget
+            from managers.journal_manager import MAX_JOURNAL_TOKENS
+
+            max_tokens = int(os.getenv("MAX_JOURNAL_TOKENS", MAX_JOURNAL_TOKENS))
+        timeout = float(os.getenv("NOTION_PAGE_CONTENT_TIMEOUT_SECONDS", NOTION_PAGE_CONTENT_TIMEOUT_SECONDS))
+
+        started = asyncio.Event()
+        content = _PageContent(page_id, max_tokens, on_started=started.set)
+        fetch = asyncio.ensure_future(self._fetch_blocks(notion_token, content))
+        try:
+            # The timeout starts with the first request, or when the read ends before sending one
+            started_wait = asyncio.ensure_future(started.wait())
+            try:
+                await asyncio.wait({fetch, started_wait}, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                started_wait.cancel()
+            await asyncio.wait_for(fetch, timeout)
+        except asyncio.TimeoutError:
+            raise JournalPageReadIncomplete(
+                f"Reading Notion page {page_id} timed out after {timeout}s", page_content=content.render()
+            )
+        except Exception as e:
+            raise JournalPageReadIncomplete(
+                f"Error reading blocks of Notion page {page_id}: {e}", page_content=content.render()
+            )
+        finally:
+            fetch.cancel()
+        return content.render()
+
+    async def _fetch_blocks(self, notion_token: str, content: _PageContent):
+        max_depth = int(os.getenv("NOTION_BLOCK_MAX_DEPTH", NOTION_BLOCK_MAX_DEPTH))
+        level = [content.page_id]
+        for depth in range(max_depth + 1):
+            if not level or content.is_full():
+                return
+            await asyncio.gather(*(self._list_children(notion_token, block_id, content) for block_id in level))
+            if depth == max_depth:
+                return
+            level = [
+                block["id"]
+                for block_id in level
+                for block in content.children.get(block_id, [])
+                if block.get("has_children") and block.get("type") not in SKIPPED_CHILD_TYPES
+            ]
+
+    async def _list_children(self, notion_token: str, block_id: str, content: _PageContent):
+        notion = NotionClientPool.get()
+        start_cursor = None
+        # Pages of one block follow a cursor, so only the blocks of a level are read concurrently
+        while not content.is_full():
+            query_params = {"block_id": block_id, "auth": notion_token, "page_size": NOTION_QUERY_PAGE_SIZE}
+            if start_cursor:
+                query_params["start_cursor"] = start_cursor
+
+            def list_children():
+                # Runs once the rate limiter handed out the slot
+                content.mark_started()
+                return notion.blocks.children.list(**query_params)
+
+            response = await self.get_rate_limiter().call(notion_token, list_children)
+            content.add(block_id, response["results"])
+            if not response.get("has_more"):
+                return
+            start_cursor = response.get("next_cursor")
@@ -0,0 +1,83 @@
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import unquote
+
+from models.models import NotionJournalEntry
+
+# Databases whose property ids are remembered, least recently used ones are dropped first
+NOTION_TRACKED_DATABASES = 10000
+
+
+class NotionPropertySchema:
+    """
+    Journal properties read by a NotionManager version.
+
+    `fields` maps each Notion property name to the NotionJournalEntry field it
+    fills and the property type holding its value, e.g.
+    `{"Gratitude": ("gratitude", "rich_text")}`. The mapping is compiled once
+    per manager class, so extracting a page is a single pass over its
+    properties.
+
+    Queries can ask Notion for the schema's properties only (`filter_properties`).
+    That parameter takes property ids, which differ per database, so the ids
+    are learned from the first page returned for each database and used from
+    the next query on.
+    """
+
+    def __init__(self, fields: Dict[str, Tuple[str, str]], ignore_property: Optional[str] = None):
+        self.fields = dict(fields)
+        self.ignore_property = ignore_property
+        self.property_names = (*self.fields, *([ignore_property] if ignore_property else []))
+        self._property_ids: "OrderedDict[str, List[str]]" = OrderedDict()
+
+    def extract(self, page: dict) -> Optional[NotionJournalEntry]:
+        journal_data = {}
+        fields = self.fields
+        for name, prop in page["properties"].items():
+            spec = fields.get(name)
+            if spec is None:
+                continue
+            field, prop_type = spec
+            # A property whose type was changed in Notion has no value under the expected key
+            text = "".join([text_obj.get("plain_text", "") for text_obj in prop.get(prop_type) or ()])
+            if text:
+                journal_data[field] = text
+
+        return NotionJournalEntry(**journal_data) if journal_data else None
+
+    def is_ignored(self, page: dict) -> bool:
+        if not self.ignore_property:
+            return False
+        return bool(page["properties"].get(self.ignore_property, {}).get("checkbox"))
+
+    def get_filter_properties(self, database_id: str) -> Optional[List[str]]:
+        """
+        Returns the property ids to request for `database_id`, or None while they are unknown.
+        """
+        property_ids = self._property_ids.get(database_id)
+        if property_ids is not None:
+            self._property_ids.move_to_end(database_id)
+        return property_ids
+
+    def remember_property_ids(self, database_id: str, page: dict):
+        """
+        Learns the database's property ids from one of its pages.
+        """
+        if database_id in self._property_ids:
+            return
+        properties = page["properties"]
+        # Ids come URL encoded, the client encodes the query string itself
+        property_ids = [
+            unquote(properties[name]["id"])
+            for name in self.property_names
+            if "id" in properties.get(name, {})
+        ]
+        if not property_ids:
+            return
+        self._property_ids[database_id] = property_ids
+        if len(self._property_ids) > NOTION_TRACKED_DATABASES:
+            self._property_ids.popitem(last=False)
+
+    def forget_property_ids(self, database_id: str):
+        # Called when Notion rejects the ids, e.g. after the user deleted a property
+        self._property_ids.pop(database_id, None)
@@ -0,0 +1,159 @@
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional, TypeVar
+
+import httpx
+from notion_client.errors import HTTPResponseError, RequestTimeoutError
+
+logger = logging.getLogger(__name__)
+
+NOTION_TOKEN_RPS = 3  # Notion's documented average limit per integration
+NOTION_TOKEN_BURST = 3
+NOTION_GLOBAL_RPS = 50  # Across all integrations, keeps one process from flooding the API
+NOTION_MAX_RETRIES = 3
+NOTION_MAX_RETRY_DELAY_SECONDS = 60
+# Per-token schedules kept in memory, idle ones are evicted first
+NOTION_TRACKED_TOKENS = 10000
+
+RETRYABLE_STATUS_CODES = (429, 500, 502, 503, 504)
+
+T = TypeVar("T")
+
+
+class _Schedule:
+    """
+    Spaces requests `1 / rate` seconds apart, allowing bursts of `burst` requests.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.interval = 1 / rate
+        self.burst_window = (burst - 1) * self.interval
+        # Theoretical arrival time of the next request
+        self.next_at = 0.0
+
+    def reserve(self) -> float:
+        """
+        Takes the next slot and returns how long to wait for it.
+        """
+        now = time.monotonic()
+        next_at = max(self.next_at, now)
+        self.next_at = next_at + self.interval
+        return max(0.0, next_at - self.burst_window - now)
+
+    def pause(self, seconds: float):
+        self.next_at = max(self.next_at, time.monotonic() + seconds + self.burst_window)
+
+    def is_idle(self) -> bool:
+        return self.next_at < time.monotonic()
+
+
+class NotionRateLimiter:
+    """
+    Schedules Notion API calls within the per-integration and global quotas.
+
+    Each access token gets its own schedule (about 3 requests per second) and
+    every call also takes a slot from a process-wide schedule. Slots are
+    reserved in call order, so concurrent fetches for one integration queue
+    up instead of being rejected. Calls answered with 429 or 5xx are retried
+    after the Retry-After delay Notion sends, or with exponential backoff.
+    """
+
+    def __init__(
+        self,
+        token_rps: Optional[float] = None,
+        token_burst: Optional[int] = None,
+        global_rps: Optional[float] = None
+    ):
+        self.token_rps = token_rps or float(os.getenv("NOTION_TOKEN_RPS", NOTION_TOKEN_RPS))
+        self.token_burst = token_burst or int(os.getenv("NOTION_TOKEN_BURST", NOTION_TOKEN_BURST))
+        self.max_retries = int(os.getenv("NOTION_MAX_RETRIES", NOTION_MAX_RETRIES))
+        self._global = _Schedule(
+            global_rps or float(os.getenv("NOTION_GLOBAL_RPS", NOTION_GLOBAL_RPS)),
+            int(os.getenv("NOTION_GLOBAL_BURST", NOTION_GLOBAL_RPS)),
+        )
+        self._tokens: "OrderedDict[str, _Schedule]" = OrderedDict()
+        self.throttled_count = 0
+        self.retried_count = 0
+
+    @staticmethod
+    def _token_key(notion_token: str) -> str:
+        # Keep raw tokens out of the limiter's keys
+        return hashlib.sha256(notion_token.encode("utf-8")).hexdigest()
+
+    def _get_schedule(self, notion_token: str) -> _Schedule:
+        key = self._token_key(notion_token)
+        schedule = self._tokens.get(key)
+        if schedule is None:
+            schedule = self._tokens[key] = _Schedule(self.token_rps, self.token_burst)
+            if len(self._tokens) > NOTION_TRACKED_TOKENS:
+                self._evict_idle()
+        self._tokens.move_to_end(key)
+        return schedule
+
+    def _evict_idle(self):
+        for key in list(self._tokens):
+            if len(self._tokens) <= NOTION_TRACKED_TOKENS:
+                break
+            if self._tokens[key].is_idle():
+                del self._tokens[key]
+
+    async def acquire(self, notion_token: str):
+        # The token slot first, so a throttled integration does not hold global slots while it waits
+        delay = self._get_schedule(notion_token).reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        delay = self._global.reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    @staticmethod
+    def _get_retry_delay(error: Exception, attempt: int) -> float:
+        headers = getattr(error, "headers", None)
+        retry_after = headers.get("retry-after") if headers is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), NOTION_MAX_RETRY_DELAY_SECONDS)
+            except ValueError:
+                pass
+        return min(2.0 ** attempt, NOTION_MAX_RETRY_DELAY_SECONDS)
+
+    async def call(self, notion_token: str, request: Callable[[], Awaitable[T]]) -> T:
+        """
+        Runs `request` within the quotas of `notion_token`, retrying rate
+        limited, failed-over and timed-out calls.
+        """
+        for attempt in range(self.max_retries + 1):
+            await self.acquire(notion_token)
+            try:
+                return await request()
+            except HTTPResponseError as e:
+                if e.status not in RETRYABLE_STATUS_CODES or attempt >= self.max_retries:
+                    raise
+                retry_delay = self._get_retry_delay(e, attempt)
+                if e.status == 429:
+                    self.throttled_count += 1
+                    # Later calls for this integration wait as well, not only this one
+                    self._get_schedule(notion_token).pause(retry_delay)
+                error = f"status {e.status}"
+            except (RequestTimeoutError, httpx.TransportError) as e:
+                if attempt >= self.max_retries:
+                    raise
+                retry_delay = self._get_retry_delay(e, attempt)
+                error = type(e).__name__
+
+            self.retried_count += 1
+            logger.warning(
+                f"Notion request failed with {error} on attempt {attempt + 1}, retrying in {retry_delay:.1f}s"
+            )
+            await asyncio.sleep(retry_delay)
+
+    def stats(self) -> dict:
+        return {
+            "tracked_tokens": len(self._tokens),
+            "throttled_count": self.throttled_count,
+            "retried_count": self.retried_count,
+        }
@@ -0,0 +1,163 @@
+import asyncio
+import hashlib
+import hmac
+import logging
+import os
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from exceptions.journal_exceptions import JournalDatabaseNotFound
+from managers.journal_sync_manager import JournalSyncManager
+from managers.notion_integration_manager import NotionIntegrationManager
+from managers.user_manager import UserManager
+
+logger = logging.getLogger(__name__)
+
+NOTION_WEBHOOK_DEBOUNCE_SECONDS = 30  # Edits arriving within this window trigger a single sync
+# Event ids remembered to drop redeliveries of the same event
+SEEN_EVENT_IDS_LIMIT = 10000
+
+# Events that can change what the journal fetch returns
+JOURNAL_EVENT_TYPES = (
+    "page.created",
+    "page.content_updated",
+    "page.properties_updated",
+    "page.undeleted",
+)
+
+
+class NotionWebhookManager:
+    """
+    Turns Notion webhook events into debounced per-user journal syncs.
+
+    Each verified event is mapped from its parent database to the owning
+    user's integration, and a sync of that user is scheduled after
+    NOTION_WEBHOOK_DEBOUNCE_SECONDS. Further events for the same user in that
+    window join the scheduled sync, so a burst of edits on a page costs one
+    incremental Notion query. Redelivered events are dropped by id.
+    """
+
+    _pending: Dict[int, asyncio.Task] = {}
+    _seen_event_ids: "OrderedDict[str, None]" = OrderedDict()
+    received = 0
+    duplicates = 0
+    debounced = 0
+    synced = 0
+    failed = 0
+
+    @staticmethod
+    def verify_signature(body: bytes, signature: Optional[str]) -> bool:
+        """
+        Checks the X-Notion-Signature header, an HMAC-SHA256 of the raw body
+        keyed with the subscription's verification token.
+        """
+        verification_token = os.getenv("NOTION_WEBHOOK_VERIFICATION_TOKEN")
+        if not verification_token or not signature:
+            return False
+        expected = "sha256=" + hmac.new(
+            verification_token.encode("utf-8"), body, hashlib.sha256
+        ).hexdigest()
+        return hmac.compare_digest(expected, signature)
+
+    @classmethod
+    def _is_duplicate(cls, event_id: Optional[str]) -> bool:
+        return bool(event_id) and event_id in cls._seen_event_ids
+
+    @classmethod
+    def _remember_event(cls, event_id: Optional[str]):
+        # Only handled events, a failed one must be accepted when Notion delivers it again
+        if not event_id:
+            return
+        cls._seen_event_ids[event_id] = None
+        while len(cls._seen_event_ids) > SEEN_EVENT_IDS_LIMIT:
+            cls._seen_event_ids.popitem(last=False)
+
+    @classmethod
+    async def handle_event(cls, event: dict) -> dict:
+        """
+        Schedules syncs for the users whose journal the event touches.
+        Returns a short summary for the webhook response.
+        """
+        cls.received += 1
+        event_id = event.get("id")
+        if cls._is_duplicate(event_id):
+            cls.duplicates += 1
+            return {"status": "duplicate"}
+        result = await cls._handle_journal_event(event)
+        cls._remember_event(event_id)
+        return result
+
+    @classmethod
+    async def _handle_journal_event(cls, event: dict) -> dict:
+        event_type = event.get("type")
+        if event_type not in JOURNAL_EVENT_TYPES:
+            return {"status": "ignored", "reason": f"Unhandled event type {event_type}"}
+
+        parent = (event.get("data") or {}).get("parent") or {}
+        database_id = parent.get("database_id") or parent.get("id")
+        if not database_id:
+            return {"status": "ignored", "reason": "Event has no parent database"}
+
+        integrations = await NotionIntegrationManager().get_integrations_by_page_id(database_id)
+        if not integrations:
+            logger.info(f"No integration found for Notion database {database_id}, ignoring {event_type} event.")
+            return {"status": "ignored", "reason": "No integration for database"}
+
+        for integration in integrations:
+            # Persisted first, so the change is synced even if the debounced sync never runs
+            await JournalSyncManager.mark_dirty(integration.user_id)
+            cls._schedule_sync(integration.user_id)
+        return {"status": "scheduled", "users": len(integrations)}
+
+    @classmethod
+    def _schedule_sync(cls, user_id: int):
+        if user_id in cls._pending:
+            cls.debounced += 1
+            return
+        cls._pending[user_id] = asyncio.create_task(cls._sync_after_debounce(user_id))
+
+    @classmethod
+    async def _sync_after_debounce(cls, user_id: int):
+        try:
+            await asyncio.sleep(float(os.getenv("NOTION_WEBHOOK_DEBOUNCE_SECONDS", NOTION_WEBHOOK_DEBOUNCE_SECONDS)))
+        finally:
+            # Events from now on schedule a new sync, so edits made during this one are not lost
+            cls._pending.pop(user_id, None)
+
+        try:
+            # Loaded after the debounce, so a token refreshed meanwhile is used
+            integration = await NotionIntegrationManager().get_integration_by_user_id(user_id)
+            if not integration:
+                return
+            await JournalSyncManager().sync_user(user_id, integration)
+            cls.synced += 1
+        except JournalDatabaseNotFound:
+            logger.info(f"Database not found for user {user_id} during webhook sync. Deactivating user")
+            await UserManager().deactivate_users([user_id])
+        except Exception as e:
+            cls.failed += 1
+            logger.error(f"Error syncing Notion journal for user {user_id} after webhook event: {e}")
+
+    @classmethod
+    async def close(cls):
+        """
+        Cancels debounced syncs that have not started. Their users stay marked
+        dirty, so the next nightly run syncs them.
+        """
+        pending = list(cls._pending.values())
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+            logger.info(f"Cancelled {len(pending)} pending Notion webhook syncs on shutdown.")
+
+    @classmethod
+    def stats(cls) -> dict:
+        return {
+            "received": cls.received,
+            "duplicates": cls.duplicates,
+            "debounced": cls.debounced,
+            "pending": len(cls._pending),
+            "synced": cls.synced,
+            "failed": cls.failed,
+        }
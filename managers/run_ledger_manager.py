@@ -0,0 +1,160 @@
+from datetime import date, datetime
+from typing import List, Optional, Set
+
+from tortoise import connections
+from tortoise.expressions import F
+
+from managers.user_manager import UserManager, NOTION_USER_RECORD_SELECT
+from models.models import JournalRunItem, NotionUserRecord
+
+# Users that failed this many times are no longer claimed in the same run
+MAX_CLAIM_ATTEMPTS = 3
+# In-progress claims older than this are considered abandoned by a dead worker
+CLAIM_LEASE_SECONDS = 30 * 60
+
+
+class RunLedgerManager:
+    """
+    Records per-user progress of the nightly Notion run in `journal_run_items`,
+    so a restarted run only processes the users that are not finished yet.
+    """
+
+    PENDING = "pending"
+    IN_PROGRESS = "in_progress"
+    COMPLETED = "completed"
+    SKIPPED = "skipped"
+    FAILED = "failed"
+
+    # Users in these states are not processed again for the same run date
+    FINISHED_STATUSES = (COMPLETED, SKIPPED)
+
+    async def register_users(self, run_date: date, user_ids: List[int]) -> Set[int]:
+        """
+        Adds pending ledger rows for the given users and returns the ids that are
+        already finished for this run date.
+        """
+        if not user_ids:
+            return set()
+        try:
+            await JournalRunItem.bulk_create(
+                [JournalRunItem(run_date=run_date, user_id=user_id, status=self.PENDING) for user_id in user_ids],
+                ignore_conflicts=True
+            )
+            finished_user_ids = await JournalRunItem.filter(
+                run_date=run_date,
+                user_id__in=user_ids,
+                status__in=self.FINISHED_STATUSES
+            ).values_list("user_id", flat=True)
+            return set(finished_user_ids)
+        except Exception as e:
+            raise Exception(f"Database error registering users in run ledger: {e}")
+
+    async def seed_run(self, run_date: date) -> int:
+        """
+        Adds a pending ledger row for every active Notion user in one statement.
+        Safe to call from several workers, existing rows are left untouched.
+        """
+        try:
+            rows = await connections.get("default").execute_query_dict(
+                """
+                WITH seeded AS (
+                    INSERT INTO journal_run_items (run_date, user_id, status)
+                    SELECT $1, id, $2 FROM users
+                    WHERE is_active = TRUE AND journal_medium = 'notion'
+                    ON CONFLICT (run_date, user_id) DO NOTHING
+                    RETURNING user_id
+                )
+                SELECT COUNT(*) AS seeded_count FROM seeded
+                """,
+                [run_date, self.PENDING]
+            )
+            return rows[0]["seeded_count"]
+        except Exception as e:
+            raise Exception(f"Database error seeding run ledger: {e}")
+
+    async def claim_users(self, run_date: date, worker_id: str, limit: int) -> List[NotionUserRecord]:
+        """
+        Claims up to `limit` unfinished users for this worker.
+
+        Rows are picked with FOR UPDATE SKIP LOCKED, so concurrent workers always
+        receive disjoint sets of users. Claims left in progress by a dead worker
+        become claimable again once their lease expires.
+        """
+        try:
+            rows = await connections.get("default").execute_query_dict(
+                """
+                WITH claimed AS (
+                    UPDATE journal_run_items
+                    SET status = $2, claimed_by = $3, claimed_at = NOW(), updated_at = NOW()
+                    WHERE id IN (
+                        SELECT id FROM journal_run_items
+                        WHERE run_date = $1
+                          AND attempts < $5
+                          AND (
+                              status IN ($6, $7)
+                              OR (status = $2 AND claimed_at < NOW() - make_interval(secs => $8::float8))
+                          )
+                        ORDER BY user_id
+                        LIMIT $4
+                        FOR UPDATE SKIP LOCKED
+                    )
+                    RETURNING user_id
+                )
+                """ + NOTION_USER_RECORD_SELECT + """
+                JOIN claimed c ON c.user_id = u.id
+                ORDER BY u.id
+                """,
+                [
+                    run_date, self.IN_PROGRESS, worker_id, limit,
+                    MAX_CLAIM_ATTEMPTS, self.PENDING, self.FAILED, CLAIM_LEASE_SECONDS
+                ]
+            )
+            return [UserManager.to_notion_user_record(row) for row in rows]
+        except Exception as e:
+            raise Exception(f"Database error claiming users from run ledger: {e}")
+
+    async def renew_claim(self, run_date: date, user_id: int, worker_id: str) -> bool:
+        """
+        Restarts the lease of this worker's claim on the user. Returns False if
+        the claim was lost, i.e. another worker re-claimed the user after the
+        lease expired.
+        """
+        try:
+            rows_affected, _ = await connections.get("default").execute_query(
+                """
+                UPDATE journal_run_items
+                SET claimed_at = NOW(), updated_at = NOW()
+                WHERE run_date = $1 AND user_id = $2 AND claimed_by = $3 AND status = $4
+                """,
+                [run_date, user_id, worker_id, self.IN_PROGRESS]
+            )
+            return rows_affected > 0
+        except Exception as e:
+            raise Exception(f"Database error renewing run ledger claim for user {user_id}: {e}")
+
+    async def mark_status(
+        self,
+        run_date: date,
+        user_id: int,
+        status: str,
+        error: Optional[str] = None,
+        worker_id: Optional[str] = None
+    ) -> bool:
+        """
+        Records the user's final status. With `worker_id` the row is only
+        updated while that worker still holds the claim. Returns whether the
+        row was updated.
+        """
+        filters = {"run_date": run_date, "user_id": user_id}
+        if worker_id:
+            filters.update(claimed_by=worker_id, status=self.IN_PROGRESS)
+        try:
+            rows_affected = await JournalRunItem.filter(**filters).update(
+                status=status,
+                attempts=F("attempts") + 1,
+                last_error=error,
+                updated_at=datetime.utcnow()
+            )
+            return rows_affected > 0
+        except Exception as e:
+            raise Exception(f"Database error updating run ledger for user {user_id}: {e}")
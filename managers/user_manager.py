@@ -1,8 +1,38 @@
-from typing import Optional
+import logging
+import time
+from typing import AsyncIterator, Awaitable, Callable, Iterable, List, Optional, Set
 from datetime import datetime
 
-from models.models import User, UserPydantic
+from models.models import User, UserPydantic, NotionUserRecord, NotionIntegrationPydantic
+from tortoise import connections
 from tortoise.exceptions import DoesNotExist, IntegrityError
+from tortoise.expressions import F
+from tortoise.transactions import in_transaction
+from utils.utils import decrypt_data
+
+logger = logging.getLogger(__name__)
+
+# Number of users fetched per keyset page when streaming active Notion users
+ACTIVE_USERS_PAGE_SIZE = 500
+
+# Pending user updates that trigger a flush of UserUpdateBuffer
+USER_UPDATE_FLUSH_SIZE = 200
+# Maximum seconds buffered user updates wait before being flushed
+USER_UPDATE_FLUSH_INTERVAL_SECONDS = 30
+
+# Users joined with their latest Notion integration, projected to the columns the batch run needs
+NOTION_USER_RECORD_SELECT = """
+    SELECT u.id, u.email, u.inactive_days_counter,
+           ni.access_token, ni.page_id, ni.version
+    FROM users u
+    LEFT JOIN LATERAL (
+        SELECT access_token, page_id, version
+        FROM notion_integrations
+        WHERE user_id = u.id
+        ORDER BY created_at DESC
+        LIMIT 1
+    ) ni ON TRUE
+"""
 
 class UserManager:
     async def create_user(self, user_data: UserPydantic) -> UserPydantic:
@@ -69,12 +99,91 @@ class UserManager:
         except Exception as e:
             raise Exception(f"Database error updating user journal medium: {e}")
 
-    async def get_active_notion_users(self) -> list[User]:
+    async def iter_active_notion_users(self, page_size: int = ACTIVE_USERS_PAGE_SIZE) -> AsyncIterator[NotionUserRecord]:
+        """
+        Streams active Notion users ordered by id, one keyset page at a time.
+
+        Each page is a single query that also joins the user's latest Notion
+        integration, and only the columns needed by the batch run are selected,
+        so memory stays bounded by `page_size` regardless of the total number
+        of users.
+        """
+        last_id = 0
+        while True:
+            try:
+                rows = await connections.get("default").execute_query_dict(
+                    NOTION_USER_RECORD_SELECT + """
+                    WHERE u.is_active = TRUE AND u.journal_medium = 'notion' AND u.id > $1
+                    ORDER BY u.id
+                    LIMIT $2
+                    """,
+                    [last_id, page_size]
+                )
+            except Exception as e:
+                raise Exception(f"Database error streaming active Notion users: {e}")
+
+            for row in rows:
+                yield UserManager.to_notion_user_record(row)
+
+            if len(rows) < page_size:
+                return
+            last_id = rows[-1]["id"]
+
+    @staticmethod
+    def to_notion_user_record(row: dict) -> NotionUserRecord:
+        """
+        Builds a NotionUserRecord from a row selected with NOTION_USER_RECORD_SELECT.
+        """
+        notion_integration = None
+        integration_error = None
+        if row.get("access_token"):
+            try:
+                access_token = decrypt_data(row["access_token"])
+            except Exception as e:
+                # A bad or rotated token fails this user only, not the whole stream
+                logger.error(f"Failed to decrypt Notion access token for user {row['id']}: {e!r}")
+                integration_error = f"Failed to decrypt Notion access token: {e!r}"
+            else:
+                notion_integration = NotionIntegrationPydantic(
+                    user_id=row["id"],
+                    access_token=access_token,
+                    page_id=row["page_id"],
+                    version=row["version"] or "v1"
+                )
+        return NotionUserRecord(
+            id=row["id"],
+            email=row["email"],
+            inactive_days_counter=row["inactive_days_counter"] or 0,
+            notion_integration=notion_integration,
+            integration_error=integration_error
+        )
+
+    async def increment_inactive_days(self, user_ids: Iterable[int]) -> int:
+        try:
+            return await User.filter(id__in=list(user_ids)).update(
+                inactive_days_counter=F("inactive_days_counter") + 1,
+                updated_at=datetime.utcnow()
+            )
+        except Exception as e:
+            raise Exception(f"Database error incrementing inactive days: {e}")
+
+    async def reset_inactive_days(self, user_ids: Iterable[int]) -> int:
         try:
-            users = await User.filter(is_active=True, journal_medium="notion")
-            return users
+            return await User.filter(id__in=list(user_ids)).update(
+                inactive_days_counter=0,
+                updated_at=datetime.utcnow()
+            )
+        except Exception as e:
+            raise Exception(f"Database error resetting inactive days: {e}")
+
+    async def deactivate_users(self, user_ids: Iterable[int]) -> int:
+        try:
+            return await User.filter(id__in=list(user_ids)).update(
+                is_active=False,
+                updated_at=datetime.utcnow()
+            )
         except Exception as e:
-            raise Exception(f"Database error fetching active Notion users: {e}")
+            raise Exception(f"Database error deactivating users: {e}")
 
     async def deactivate_long_inactive_users(self, inactivity_threshold: int) -> int:
         """
@@ -95,3 +204,105 @@ class UserManager:
             return rows_affected
         except Exception as e:
             raise Exception(f"Database error during user deactivation: {e}")
+
+
+class UserUpdateBuffer:
+    """
+    Collects per-user inactivity updates during a batch run and writes them as
+    a few set-based UPDATE statements instead of one statement per user.
+
+    Updates are flushed once USER_UPDATE_FLUSH_SIZE of them are pending or
+    USER_UPDATE_FLUSH_INTERVAL_SECONDS have passed, and by an explicit flush()
+    at the end of the run. A flush writes all updates in one transaction, and
+    updates from a failed flush are kept for the next one.
+    """
+
+    def __init__(
+        self,
+        user_manager: UserManager = None,
+        flush_size: int = USER_UPDATE_FLUSH_SIZE,
+        flush_interval: float = USER_UPDATE_FLUSH_INTERVAL_SECONDS
+    ):
+        self.user_manager = user_manager or UserManager()
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self._increments: Set[int] = set()
+        self._resets: Set[int] = set()
+        self._deactivations: Set[int] = set()
+        self._after_flush: List[Callable[[], Awaitable[None]]] = []
+        self._last_flush = time.monotonic()
+
+    @property
+    def pending_count(self) -> int:
+        return len(self._increments) + len(self._resets) + len(self._deactivations)
+
+    async def increment_inactive_days(self, user_id: int):
+        self._increments.add(user_id)
+        await self._maybe_flush()
+
+    async def reset_inactive_days(self, user_id: int):
+        self._resets.add(user_id)
+        await self._maybe_flush()
+
+    async def deactivate(self, user_id: int):
+        self._deactivations.add(user_id)
+        await self._maybe_flush()
+
+    async def defer(self, callback: Callable[[], Awaitable[None]]):
+        """
+        Runs `callback` once the updates queued so far are written, e.g. a run
+        ledger status that must not be recorded before the user's update.
+        """
+        self._after_flush.append(callback)
+        await self._maybe_flush()
+
+    async def _maybe_flush(self):
+        if (self.pending_count + len(self._after_flush) >= self.flush_size
+                or time.monotonic() - self._last_flush >= self.flush_interval):
+            try:
+                await self.flush()
+            except Exception as e:
+                # The updates stay queued and are written by the next flush
+                logger.error(f"{e}, retrying with the next flush.")
+
+    async def flush(self):
+        """
+        Writes the pending updates, then runs the deferred callbacks.
+        Raises if the updates could not be written, they are kept in the buffer.
+        """
+        # Swap the pending sets first so updates added during the flush are kept
+        increments, self._increments = self._increments, set()
+        resets, self._resets = self._resets, set()
+        deactivations, self._deactivations = self._deactivations, set()
+        after_flush, self._after_flush = self._after_flush, []
+        self._last_flush = time.monotonic()
+
+        try:
+            if increments or resets or deactivations:
+                # One transaction, so a retried flush never applies an increment twice
+                async with in_transaction():
+                    if increments:
+                        await self.user_manager.increment_inactive_days(increments)
+                    if resets:
+                        await self.user_manager.reset_inactive_days(resets)
+                    if deactivations:
+                        await self.user_manager.deactivate_users(deactivations)
+        except Exception as e:
+            self._increments |= increments
+            self._resets |= resets
+            self._deactivations |= deactivations
+            self._after_flush[:0] = after_flush
+            raise Exception(f"Error flushing buffered user updates: {e}")
+
+        for callback in after_flush:
+            # The updates are written, so one failing callback must not drop the others
+            try:
+                await callback()
+            except Exception as e:
+                logger.error(f"Error running callback after flushing user updates: {e}")
+
+        if increments or resets or deactivations:
+            logger.info(
+                f"Flushed user updates: {len(increments)} increments, "
+                f"{len(resets)} resets, {len(deactivations)} deactivations."
+            )
@@ -0,0 +1,15 @@
+-- Create journal_run_items table to track per-user progress of the nightly Notion run
+CREATE TABLE IF NOT EXISTS journal_run_items (
+    id SERIAL PRIMARY KEY,
+    run_date DATE NOT NULL,
+    user_id INTEGER NOT NULL,
+    status VARCHAR(50) DEFAULT 'pending' NOT NULL,
+    attempts INTEGER DEFAULT 0 NOT NULL,
+    last_error TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL,
+    UNIQUE (run_date, user_id),
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+CREATE INDEX IF NOT EXISTS idx_journal_run_items_run_date_status ON journal_run_items (run_date, status);
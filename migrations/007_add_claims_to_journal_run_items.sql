@@ -0,0 +1,2 @@
+ALTER TABLE journal_run_items ADD COLUMN claimed_by VARCHAR(255);
+ALTER TABLE journal_run_items ADD COLUMN claimed_at TIMESTAMP;
@@ -0,0 +1,32 @@
+-- Create notion_journal_entries table, a local mirror of the journal pages synced from each user's Notion database
+CREATE TABLE IF NOT EXISTS notion_journal_entries (
+    id SERIAL PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    database_id VARCHAR(255) NOT NULL,
+    page_id VARCHAR(64) UNIQUE NOT NULL,
+    entry_title TEXT,
+    gratitude TEXT,
+    highlights TEXT,
+    challenges TEXT,
+    reflection TEXT,
+    is_ignored BOOLEAN DEFAULT FALSE NOT NULL,
+    page_created_time TIMESTAMPTZ NOT NULL,
+    page_last_edited_time TIMESTAMPTZ NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+CREATE INDEX IF NOT EXISTS idx_notion_journal_entries_user_last_edited ON notion_journal_entries (user_id, page_last_edited_time);
+
+-- Create notion_sync_cursors table, the position up to which each user's Notion database has been synced
+CREATE TABLE IF NOT EXISTS notion_sync_cursors (
+    user_id INTEGER PRIMARY KEY,
+    database_id VARCHAR(255) NOT NULL,
+    last_edited_time TIMESTAMPTZ,
+    last_page_id VARCHAR(64),
+    synced_at TIMESTAMPTZ,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
@@ -0,0 +1,2 @@
+-- Add page_content to notion_journal_entries, the text of the page body read by v3 integrations
+ALTER TABLE notion_journal_entries ADD COLUMN page_content TEXT;
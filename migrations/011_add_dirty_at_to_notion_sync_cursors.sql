@@ -0,0 +1,2 @@
+-- Add dirty_at to notion_sync_cursors, set by Notion webhook events until a sync picks up the change
+ALTER TABLE notion_sync_cursors ADD COLUMN dirty_at TIMESTAMPTZ;
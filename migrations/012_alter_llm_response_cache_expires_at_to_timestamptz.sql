@@ -0,0 +1,4 @@
+-- Store llm_response_cache expiry as TIMESTAMPTZ, Tortoise binds time zone aware datetimes
+ALTER TABLE llm_response_cache
+    ALTER COLUMN expires_at TYPE TIMESTAMPTZ USING expires_at AT TIME ZONE 'UTC',
+    ALTER COLUMN created_at TYPE TIMESTAMPTZ USING created_at AT TIME ZONE 'UTC';
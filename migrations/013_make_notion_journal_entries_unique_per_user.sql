@@ -0,0 +1,3 @@
+-- Make notion_journal_entries unique per user and page, users sharing a journal database each keep their own copy
+ALTER TABLE notion_journal_entries DROP CONSTRAINT IF EXISTS notion_journal_entries_page_id_key;
+ALTER TABLE notion_journal_entries ADD CONSTRAINT notion_journal_entries_user_id_page_id_key UNIQUE (user_id, page_id);
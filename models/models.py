@@ -1,5 +1,5 @@
-from pydantic import BaseModel, Field
-from typing import Optional
+from pydantic import BaseModel, Field, PrivateAttr
+from typing import Optional, Tuple
 from uuid import UUID
 from datetime import datetime
 from tortoise import fields, models
@@ -10,6 +10,14 @@ class NotionJournalEntry(BaseModel):
     highlights: Optional[str] = Field(None, description="The highlights of the user's day.")
     challenges: Optional[str] = Field(None, description="Challenges the user faced.")
     reflection: Optional[str] = Field(None, description="The user's reflections on the day.")
+    page_content: Optional[str] = Field(None, description="Text the user wrote in the body of the page.")
+
+    # (token budget, prompt JSON) set by JournalManager, so the entry is truncated once for all calls
+    _prompt_json: Optional[Tuple[int, str]] = PrivateAttr(default=None)
+
+class JournalReply(BaseModel):
+    message: str = Field(..., description="The motivational reply to the journal entry.")
+    subject: str = Field(..., description="The email subject line for the reply.")
 
 class JournalEntry(BaseModel):
     content: str
@@ -67,6 +75,18 @@ class UserPydantic(BaseModel):
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
 
+class NotionUserRecord(BaseModel):
+    """
+    Lightweight projection of an active Notion user, used by the batch run.
+    The user's latest Notion integration is loaded together with the record.
+    """
+    id: int
+    email: str
+    inactive_days_counter: int = 0
+    notion_integration: Optional["NotionIntegrationPydantic"] = None
+    # Set when the integration could not be loaded, e.g. its token fails to decrypt
+    integration_error: Optional[str] = None
+
 class NotionIntegration(models.Model):
     id = fields.IntField(pk=True)
     user_id = fields.IntField(unique=True)
@@ -98,3 +118,81 @@ class NotionIntegrationPydantic(BaseModel):
     version: str
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
+
+NotionUserRecord.model_rebuild()
+
+class JournalRunItem(models.Model):
+    id = fields.IntField(pk=True)
+    run_date = fields.DateField()
+    user_id = fields.IntField()
+    status = fields.CharField(max_length=50, default="pending")
+    attempts = fields.IntField(default=0)
+    last_error = fields.TextField(null=True)
+    claimed_by = fields.CharField(max_length=255, null=True)
+    claimed_at = fields.DatetimeField(null=True)
+    created_at = fields.DatetimeField(auto_now_add=True)
+    updated_at = fields.DatetimeField(auto_now=True)
+
+    class Meta:
+        table = "journal_run_items"
+        unique_together = (("run_date", "user_id"),)
+
+class LLMResponseCache(models.Model):
+    cache_key = fields.CharField(max_length=64, pk=True)
+    response = fields.TextField()
+    expires_at = fields.DatetimeField()
+    created_at = fields.DatetimeField(auto_now_add=True)
+
+    class Meta:
+        table = "llm_response_cache"
+
+class NotionJournalEntryRecord(models.Model):
+    id = fields.IntField(pk=True)
+    user_id = fields.IntField()
+    database_id = fields.CharField(max_length=255)
+    page_id = fields.CharField(max_length=64)
+    entry_title = fields.TextField(null=True)
+    gratitude = fields.TextField(null=True)
+    highlights = fields.TextField(null=True)
+    challenges = fields.TextField(null=True)
+    reflection = fields.TextField(null=True)
+    page_content = fields.TextField(null=True)
+    is_ignored = fields.BooleanField(default=False)
+    page_created_time = fields.DatetimeField()
+    page_last_edited_time = fields.DatetimeField()
+    created_at = fields.DatetimeField(auto_now_add=True)
+    updated_at = fields.DatetimeField(auto_now=True)
+
+    class Meta:
+        table = "notion_journal_entries"
+        # Users sharing a journal database each keep their own copy of its pages
+        unique_together = (("user_id", "page_id"),)
+
+    def to_journal_entry(self) -> Optional[NotionJournalEntry]:
+        journal_data = {
+            key: value
+            for key, value in {
+                "entry_title": self.entry_title,
+                "gratitude": self.gratitude,
+                "highlights": self.highlights,
+                "challenges": self.challenges,
+                "reflection": self.reflection,
+                "page_content": self.page_content,
+            }.items()
+            if value
+        }
+        return NotionJournalEntry(**journal_data) if journal_data else None
+
+class NotionSyncCursor(models.Model):
+    user_id = fields.IntField(pk=True, generated=False)
+    database_id = fields.CharField(max_length=255)
+    last_edited_time = fields.DatetimeField(null=True)
+    last_page_id = fields.CharField(max_length=64, null=True)
+    synced_at = fields.DatetimeField(null=True)
+    # Set when a webhook event reported a change that no sync has picked up yet
+    dirty_at = fields.DatetimeField(null=True)
+    created_at = fields.DatetimeField(auto_now_add=True)
+    updated_at = fields.DatetimeField(auto_now=True)
+
+    class Meta:
+        table = "notion_sync_cursors"
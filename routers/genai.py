@@ -1,5 +1,5 @@
 from fastapi import APIRouter, HTTPException
-from managers.genai_manager import GenAIManager
+from managers.genai_manager import GENERATION_PROFILES, GenAIManager
 import logging
 import os
 from dotenv import load_dotenv
@@ -41,14 +41,20 @@ async def get_available_models():
         raise HTTPException(status_code=500, detail=f"Failed to fetch available models: {e}")
 
 @router.post("/test-generate")
-async def test_generate(prompt: str, system_prompt: str = None):
+async def test_generate(prompt: str, system_prompt: str = None, profile: str = "journal"):
     """
-    Test text generation with the GenAI model.
+    Test text generation with the GenAI model, using the given generation profile.
     """
+    if profile not in GENERATION_PROFILES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown generation profile: {profile}. Available profiles: {', '.join(GENERATION_PROFILES)}"
+        )
     try:
-        response = await GenAIManager.generate(prompt, system_prompt)
+        response = await GenAIManager.generate(prompt, system_prompt, profile=profile)
         return {
-            "model_used": os.getenv('GOOGLE_GENAI_MODEL', 'gemini-2.5-flash'),
+            "model_used": GenAIManager.get_generation_settings(profile)["model"],
+            "profile": profile,
             "prompt": prompt,
             "system_prompt": system_prompt,
             "response": response
@@ -58,17 +64,29 @@ async def test_generate(prompt: str, system_prompt: str = None):
         raise HTTPException(status_code=500, detail=f"Failed to test generation: {e}")
 
 @router.get("/health")
-async def genai_health():
+async def genai_health(active: bool = False):
     """
     Check GenAI service health.
+
+    By default the status is derived from recent real calls and served from
+    memory, so polling it costs no model calls. With `?active=true` a real
+    generation is sent to Gemini.
     """
+    if not active:
+        return {
+            "environment": os.getenv('ENVIRONMENT', 'production'),
+            **GenAIManager.get_health_status(),
+            "model": os.getenv('GOOGLE_GENAI_MODEL', 'gemini-2.5-flash'),
+            "api_key_configured": bool(os.getenv('GOOGLE_GENAI_API_KEY'))
+        }
+
     try:
         # Test with a simple prompt
-        test_response = await GenAIManager.generate("Hello", "Respond with a single word: 'OK'")
+        test_response = await GenAIManager.generate("Hello", "Respond with a single word: 'OK'", profile="health")
         return {
             "environment": os.getenv('ENVIRONMENT', 'production'),
             "status": "healthy",
-            "model": os.getenv('GOOGLE_GENAI_MODEL', 'gemini-2.5-flash'),
+            "model": GenAIManager.get_generation_settings("health")["model"],
             "test_response": test_response,
             "api_key_configured": bool(os.getenv('GOOGLE_GENAI_API_KEY'))
         }
@@ -1,11 +1,13 @@
 from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from models.models import JournalEntry, Journal
+from models.models import JournalEntry, Journal, NotionJournalEntry
 from managers.journal_manager import JournalManager
 from managers.notion_module.notion_manager import NotionManager
 from managers.notion_integration_manager import NotionIntegrationManager
 from managers.email_manager import EmailManager
 import logging
+import json
 import os
 from dotenv import load_dotenv
 load_dotenv()
@@ -43,6 +45,33 @@ async def generate_message(journal_entry: JournalEntry):
         logger.error(f"Error generating message: {e}")
         raise HTTPException(status_code=500, detail="Failed to generate message.")
 
+@router.post("/generate-message/stream")
+async def generate_message_stream(journal_entry: JournalEntry):
+    """
+    Streams the motivational message as Server-Sent Events.
+
+    Each chunk is sent as a `data` event with a JSON body {"text": ...},
+    followed by a final `done` event, or an `error` event if the stream
+    breaks after the first chunk.
+    """
+    journal_content = NotionJournalEntry(reflection=journal_entry.content)
+
+    async def event_stream():
+        try:
+            async for chunk in JournalManager.stream_motivational_message(journal_content):
+                yield f"data: {json.dumps({'text': chunk})}\n\n"
+            yield "event: done\ndata: {}\n\n"
+        except Exception as e:
+            logger.error(f"Error streaming message: {e}")
+            yield f"event: error\ndata: {json.dumps({'detail': 'Failed to generate message.'})}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        # Stop proxies from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @router.get("/journal/today")
 async def get_todays_journal(user_id: int = 1):
     try:
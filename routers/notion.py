@@ -1,8 +1,12 @@
 import httpx
+import json
 import logging
-from fastapi import APIRouter, HTTPException, status
+import os
+from typing import Optional
+from fastapi import APIRouter, Header, HTTPException, Request, status
 
 from managers.notion_module.notion_manager import NotionManager
+from managers.notion_module.notion_webhook_manager import NotionWebhookManager
 from routers.validations.notion_validation import NotionAuthCode, Token
 
 router = APIRouter()
@@ -26,3 +30,33 @@ async def authorize_notion(auth_code: NotionAuthCode):
         logger.error(f"An unexpected error occurred during Notion authorization: {e}")
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="An unexpected error occurred during authorization. Please try again later.")
 
+
+@router.post("/notion/webhook")
+async def notion_webhook(request: Request, x_notion_signature: Optional[str] = Header(None)):
+    """
+    Receives Notion webhook events and schedules a sync of the affected user's journal.
+    """
+    body = await request.body()
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid JSON payload.")
+
+    if "verification_token" in payload and not os.getenv("NOTION_WEBHOOK_VERIFICATION_TOKEN"):
+        # Sent once when the subscription is created, it must be entered in Notion to activate it
+        logger.warning(
+            "Received Notion webhook verification token. Set NOTION_WEBHOOK_VERIFICATION_TOKEN to "
+            f"{payload['verification_token']} and confirm the subscription in Notion."
+        )
+        return {"status": "verification_received"}
+
+    if not NotionWebhookManager.verify_signature(body, x_notion_signature):
+        logger.warning("Rejected Notion webhook with a missing or invalid signature.")
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid signature.")
+
+    try:
+        return await NotionWebhookManager.handle_event(payload)
+    except Exception as e:
+        # A non-2xx answer makes Notion deliver the event again
+        logger.error(f"Error handling Notion webhook event {payload.get('id')}: {e}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to handle event.")
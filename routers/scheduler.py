@@ -1,4 +1,4 @@
-from fastapi import APIRouter, BackgroundTasks, Depends
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status
 import logging
 
 from managers.batch_processor import BatchProcessor
@@ -9,12 +9,29 @@ logger = logging.getLogger(__name__)
 
 
 @router.post("/schedule/process-notion-journals", dependencies=[Depends(verify_token)])
-async def schedule_notion_journal_processing(background_tasks: BackgroundTasks):
-    logger.info("Received request to schedule Notion journal processing.")
-    background_tasks.add_task(BatchProcessor().process_notion_users_in_batches)
+async def schedule_notion_journal_processing(background_tasks: BackgroundTasks, sharded: bool = False, offline: bool = False):
+    logger.info(f"Received request to schedule Notion journal processing (sharded={sharded}, offline={offline}).")
+    if sharded and offline:
+        # Batch jobs can outlive the claim lease, which would let other workers re-send emails
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Offline batch generation is not supported in sharded mode."
+        )
+    if sharded:
+        # Each instance receiving this request joins the run as one more worker
+        background_tasks.add_task(BatchProcessor().process_notion_users_sharded)
+    else:
+        background_tasks.add_task(BatchProcessor().process_notion_users_in_batches, offline=offline)
     return {"message": "Notion journal processing scheduled in background."}
 
 
+@router.post("/schedule/sync-notion-journals", dependencies=[Depends(verify_token)])
+async def schedule_notion_journal_sync(background_tasks: BackgroundTasks):
+    logger.info("Received request to schedule Notion journal sync.")
+    background_tasks.add_task(BatchProcessor().sync_notion_journals)
+    return {"message": "Notion journal sync scheduled in background."}
+
+
 @router.post("/schedule/deactivate-inactive-users", dependencies=[Depends(verify_token)])
 async def schedule_deactivate_inactive_users(background_tasks: BackgroundTasks):
     logger.info("Received request to schedule deactivation of inactive users.")
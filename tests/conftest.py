@@ -0,0 +1,9 @@
+import os
+import sys
+
+from cryptography.fernet import Fernet
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# utils.utils builds its Fernet instance on import
+os.environ.setdefault("FERNET_KEY", Fernet.generate_key().decode())
@@ -0,0 +1,60 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from tortoise import Tortoise
+
+from managers.genai_cache import GenAIResponseCache
+from models.models import LLMResponseCache
+
+
+@pytest.fixture
+def db_cache(monkeypatch):
+    monkeypatch.setenv("GENAI_CACHE_ENABLED", "true")
+    monkeypatch.setenv("GENAI_CACHE_DB_ENABLED", "true")
+    monkeypatch.setattr(GenAIResponseCache, "_entries", type(GenAIResponseCache._entries)())
+    monkeypatch.setattr(GenAIResponseCache, "_last_purge", 0.0)
+    monkeypatch.setattr(GenAIResponseCache, "db_hits", 0)
+
+
+def _run(scenario):
+    async def main():
+        await Tortoise.init(db_url="sqlite://:memory:", modules={"models": ["models.models"]})
+        await Tortoise.generate_schemas()
+        try:
+            await scenario()
+        finally:
+            await Tortoise.close_connections()
+
+    asyncio.run(main())
+
+
+def test_response_is_served_from_the_database_tier(db_cache):
+    async def scenario():
+        await GenAIResponseCache.set("key", "cached reply")
+        row = await LLMResponseCache.get(cache_key="key")
+        # Bound time zone aware, the column is TIMESTAMPTZ
+        assert row.expires_at.tzinfo is not None
+        assert row.expires_at > datetime.now(timezone.utc)
+
+        # Another process only has the database tier
+        GenAIResponseCache._entries.clear()
+        assert await GenAIResponseCache.get("key") == "cached reply"
+        assert GenAIResponseCache.db_hits == 1
+        # And keeps it in memory afterwards, until the row's expiry
+        assert GenAIResponseCache._entries["key"][1] == pytest.approx(row.expires_at.timestamp())
+
+    _run(scenario)
+
+
+def test_expired_rows_are_ignored_and_purged(db_cache):
+    async def scenario():
+        await LLMResponseCache.create(
+            cache_key="expired", response="old reply", expires_at=datetime.now(timezone.utc) - timedelta(minutes=1)
+        )
+        assert await GenAIResponseCache.get("expired") is None
+
+        await GenAIResponseCache.set("fresh", "new reply")
+        assert await LLMResponseCache.all().values_list("cache_key", flat=True) == ["fresh"]
+
+    _run(scenario)
@@ -0,0 +1,61 @@
+import asyncio
+
+import pytest
+
+from exceptions.genai_exceptions import GenAICircuitOpenError
+from managers.genai_circuit_breaker import GenAICircuitBreaker
+from managers.genai_manager import GenAIManager
+from managers.genai_rate_limiter import GenAIRateLimiter
+
+
+class _Models:
+    def __init__(self):
+        self.calls = 0
+
+    async def generate_content_stream(self, model, contents, config):
+        self.calls += 1
+        raise AssertionError("the call must not be sent")
+
+
+class _Client:
+    def __init__(self):
+        self.models = _Models()
+
+
+@pytest.fixture
+def half_open_breaker(monkeypatch):
+    monkeypatch.setattr(GenAIManager, "_client", _Client())
+    circuit_breaker = GenAICircuitBreaker(failure_threshold=1, open_seconds=60)
+    circuit_breaker.state = GenAICircuitBreaker.OPEN
+    # Opened long enough ago that the next call is the half-open probe
+    circuit_breaker.opened_at = -60
+    monkeypatch.setattr(GenAIManager, "_circuit_breaker", circuit_breaker)
+    return circuit_breaker
+
+
+def test_probe_cancelled_while_waiting_for_a_rate_limit_slot_is_released(half_open_breaker, monkeypatch):
+    rate_limiter = GenAIRateLimiter(max_concurrency=1)
+    # Every slot is taken, the stream waits in acquire
+    rate_limiter.in_flight = 1
+    monkeypatch.setattr(GenAIManager, "_rate_limiter", rate_limiter)
+
+    async def consume():
+        async for _ in GenAIManager.generate_stream("prompt"):
+            pass
+
+    async def scenario():
+        task = asyncio.create_task(consume())
+        await asyncio.sleep(0.05)
+        assert half_open_breaker.state == GenAICircuitBreaker.HALF_OPEN
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(scenario())
+
+    assert rate_limiter.in_flight == 1
+    assert GenAIManager._client.models.calls == 0
+    # The next call is let through as the probe instead of failing fast forever
+    half_open_breaker.before_call()
+    with pytest.raises(GenAICircuitOpenError):
+        half_open_breaker.before_call()
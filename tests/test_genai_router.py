@@ -0,0 +1,26 @@
+import asyncio
+
+import httpx
+from fastapi import FastAPI
+
+from managers.genai_manager import GenAIManager
+from routers import genai
+
+
+def test_unknown_generation_profile_is_rejected(monkeypatch):
+    async def generate(*args, **kwargs):
+        raise AssertionError("no generation for an unknown profile")
+
+    monkeypatch.setattr(GenAIManager, "generate", generate)
+    app = FastAPI()
+    app.include_router(genai.router)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post("/test-generate", params={"prompt": "Hello", "profile": "creative"})
+
+    response = asyncio.run(scenario())
+
+    assert response.status_code == 400
+    assert "Unknown generation profile: creative" in response.json()["detail"]
@@ -0,0 +1,133 @@
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from tortoise import Tortoise
+
+from managers.journal_sync_manager import JournalSyncManager
+from managers.notion_integration_manager import NotionIntegrationManager
+from managers.notion_module.notion_client_pool import NotionClientPool
+from managers.notion_module.notion_manager import NotionManager
+from models.models import NotionIntegration, NotionJournalEntryRecord, NotionSyncCursor, User
+from utils.utils import encrypt_data
+
+DATABASE_ID = "0123456789abcdef0123456789abcdef"
+
+
+def _page(page_id: str, last_edited_time: str) -> dict:
+    return {
+        "id": page_id,
+        "created_time": "2026-10-18T08:00:00.000Z",
+        "last_edited_time": last_edited_time,
+        "properties": {
+            "Ignore Entry": {"id": "i", "type": "checkbox", "checkbox": False},
+        },
+    }
+
+
+# Oldest edit first, as the delta query sorts them
+PAGES = [
+    _page("page-1", "2026-10-18T09:00:00.000Z"),
+    _page("page-2", "2026-10-18T10:00:00.000Z"),
+    _page("page-3", "2026-10-18T11:00:00.000Z"),
+]
+
+
+@pytest.fixture
+def notion(monkeypatch):
+    monkeypatch.setenv("NOTION_SYNC_INITIAL_LOOKBACK_HOURS", str(10 * 365 * 24))
+    notion = SimpleNamespace(queries=0, failing_blocks=set())
+
+    def handle_notion_request(request: httpx.Request) -> httpx.Response:
+        if request.url.path.endswith("/query"):
+            notion.queries += 1
+            return httpx.Response(200, json={"results": PAGES, "has_more": False})
+        block_id = request.url.path.split("/")[3]
+        if block_id in notion.failing_blocks:
+            return httpx.Response(
+                400, json={"object": "error", "status": 400, "code": "validation_error", "message": "Bad block"}
+            )
+        paragraph = {"rich_text": [{"plain_text": f"Body of {block_id}."}]}
+        block = {"id": f"{block_id}-text", "type": "paragraph", "has_children": False, "paragraph": paragraph}
+        return httpx.Response(200, json={"results": [block], "has_more": False})
+
+    monkeypatch.setattr(NotionClientPool, "_client", None)
+    NotionClientPool.get().client._transport = httpx.MockTransport(handle_notion_request)
+    # The token's rate limit schedule would hold back the requests of later tests
+    monkeypatch.setattr(NotionManager, "_rate_limiter", None)
+    return notion
+
+
+def _run(scenario):
+    async def main():
+        await Tortoise.init(db_url="sqlite://:memory:", modules={"models": ["models.models"]})
+        await Tortoise.generate_schemas()
+        try:
+            await User.create(id=1, email="writer@example.com", journal_medium="notion")
+            await NotionIntegration.create(
+                user_id=1, access_token=encrypt_data("notion-token"), page_id=DATABASE_ID, version="v3"
+            )
+            integration = await NotionIntegrationManager().get_integration_by_user_id(1)
+            await scenario(integration)
+        finally:
+            await Tortoise.close_connections()
+
+    asyncio.run(main())
+
+
+def test_incomplete_page_is_not_mirrored_and_holds_back_the_cursor(notion):
+    notion.failing_blocks.add("page-2")
+
+    async def scenario(integration):
+        assert await JournalSyncManager().sync_user(1, integration) == 2
+        mirrored = await NotionJournalEntryRecord.all().order_by("page_id").values_list("page_id", "page_content")
+        assert mirrored == [("page-1", "Body of page-1."), ("page-3", "Body of page-3.")]
+        cursor = await NotionSyncCursor.get(user_id=1)
+        assert cursor.last_page_id == "page-1"
+        assert cursor.synced_at is None
+
+        # The next sync starts at page-1 again and reads page-2 completely
+        notion.failing_blocks.clear()
+        assert await JournalSyncManager().sync_user(1, integration) == 3
+        assert await NotionJournalEntryRecord.get(page_id="page-2").values_list("page_content", flat=True) == (
+            "Body of page-2."
+        )
+        cursor = await NotionSyncCursor.get(user_id=1)
+        assert cursor.last_page_id == "page-3"
+        assert cursor.synced_at is not None
+
+    _run(scenario)
+
+
+def test_recently_synced_mirror_is_read_without_querying_notion(notion, monkeypatch):
+    async def scenario(integration):
+        # e.g. /schedule/sync-notion-journals shortly before the nightly run
+        await JournalSyncManager().sync_user(1, integration)
+        await JournalSyncManager().get_latest_journal_entry(1, integration)
+        assert notion.queries == 1
+
+        monkeypatch.setenv("NOTION_SYNC_MAX_STALENESS_SECONDS", "0")
+        await JournalSyncManager().get_latest_journal_entry(1, integration)
+        assert notion.queries == 2
+
+    _run(scenario)
+
+
+def test_users_sharing_a_database_each_keep_their_pages(notion):
+    async def scenario(integration):
+        await User.create(id=2, email="partner@example.com", journal_medium="notion")
+        await NotionIntegration.create(
+            user_id=2, access_token=encrypt_data("partner-token"), page_id=DATABASE_ID, version="v3"
+        )
+        partner_integration = await NotionIntegrationManager().get_integration_by_user_id(2)
+
+        await JournalSyncManager().sync_user(1, integration)
+        await JournalSyncManager().sync_user(2, partner_integration)
+        # Synced again, the pages are updated in place
+        await JournalSyncManager().sync_user(1, integration)
+
+        assert await NotionJournalEntryRecord.filter(user_id=1).count() == len(PAGES)
+        assert await NotionJournalEntryRecord.filter(user_id=2).count() == len(PAGES)
+
+    _run(scenario)
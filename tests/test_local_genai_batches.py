@@ -0,0 +1,113 @@
+import asyncio
+import json
+
+import pytest
+
+from managers.genai_cache import GenAIResponseCache
+from managers.genai_manager import GenAIManager
+from managers.journal_manager import JournalManager
+from managers.journal_pipeline import JournalPipeline
+from managers.local_genai_batches import LocalGenAIBatches, default_local_responder
+from models.models import JournalReply, NotionJournalEntry, NotionUserRecord
+
+INTERACTIVE_REPLY = {"message": "Interactive reply.", "subject": "Interactive subject"}
+
+
+class _Response:
+    def __init__(self, text: str):
+        self.text = text
+        self.usage_metadata = None
+        self.candidates = []
+
+
+class _Models:
+    def __init__(self):
+        self.calls = 0
+
+    async def generate_content(self, model, contents, config):
+        self.calls += 1
+        if config.response_schema:
+            return _Response(json.dumps(INTERACTIVE_REPLY))
+        return _Response("Interactive message.")
+
+
+class _Client:
+    def __init__(self):
+        self.models = _Models()
+
+
+def _responder_for(bad_reflections: dict):
+    """
+    Answers like the default responder, except for entries whose reflection
+    maps to a bad response (None for a missing result, or any invalid text).
+    """
+    def responder(request):
+        prompt = request.contents[0].parts[0].text
+        for reflection, response in bad_reflections.items():
+            if reflection in prompt:
+                return response
+        return default_local_responder(request)
+
+    return responder
+
+
+@pytest.fixture
+def genai(monkeypatch):
+    monkeypatch.setenv("GENAI_BATCH_BACKEND", "local")
+    monkeypatch.setenv("GENAI_BATCH_POLL_SECONDS", "0")
+    monkeypatch.setenv("GENAI_CACHE_ENABLED", "false")
+    monkeypatch.setenv("GENAI_CONTEXT_CACHE_ENABLED", "false")
+    monkeypatch.setenv("GENAI_COMBINED_GENERATION", "true")
+    monkeypatch.setenv("GENAI_HEDGING_ENABLED", "false")
+    client = _Client()
+    monkeypatch.setattr(GenAIManager, "_client", client)
+    monkeypatch.setattr(GenAIManager, "_local_batches", None)
+    monkeypatch.setattr(GenAIManager, "_circuit_breaker", None)
+    monkeypatch.setattr(GenAIResponseCache, "_entries", type(GenAIResponseCache._entries)())
+    return client
+
+
+def test_generate_replies_in_batch_returns_none_for_missing_and_invalid_results(genai):
+    GenAIManager._local_batches = LocalGenAIBatches(
+        _responder_for({"missing": None, "garbled": "not json"}), polls_until_done=2
+    )
+    entries = [
+        NotionJournalEntry(reflection="first"),
+        NotionJournalEntry(reflection="missing"),
+        NotionJournalEntry(reflection="garbled"),
+    ]
+
+    replies = asyncio.run(JournalManager.generate_replies_in_batch(entries))
+
+    assert replies[0] == JournalReply(message="This is a locally generated batch reply.", subject="Local batch subject")
+    assert replies[1] is None
+    assert replies[2] is None
+    assert genai.models.calls == 0
+
+
+def test_offline_pipeline_falls_back_to_interactive_calls(genai):
+    GenAIManager._local_batches = LocalGenAIBatches(
+        _responder_for({"missing": None, "garbled": "{\"message\": \"\"}"})
+    )
+    reflections = {1: "first", 2: "missing", 3: "garbled"}
+    sent = {}
+
+    class _JournalManager:
+        async def fetch_user_journal(self, user, user_update_buffer=None):
+            return {"status": "ok", "journal_content": NotionJournalEntry(reflection=reflections[user.id])}
+
+        async def send_journal_email(self, user, message, subject):
+            sent[user.id] = (message, subject)
+
+    async def users():
+        for user_id in reflections:
+            yield NotionUserRecord(id=user_id, email=f"user{user_id}@example.com")
+
+    summary = asyncio.run(JournalPipeline(_JournalManager(), offline=True).run(users()))
+
+    assert summary["processed"] == 3
+    assert sent[1] == ("This is a locally generated batch reply.", "Local batch subject")
+    assert sent[2] == (INTERACTIVE_REPLY["message"], INTERACTIVE_REPLY["subject"])
+    assert sent[3] == (INTERACTIVE_REPLY["message"], INTERACTIVE_REPLY["subject"])
+    # One interactive combined call for each entry without a usable batch result
+    assert genai.models.calls == 2
@@ -0,0 +1,77 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from google.genai.errors import APIError
+
+from managers.genai_manager import GenAIManager
+
+
+class _Response:
+    def __init__(self, text: str):
+        self.text = text
+        self.usage_metadata = None
+        self.candidates = []
+
+
+class _Models:
+    def __init__(self):
+        self.requests = []
+
+    async def generate_content(self, model, contents, config):
+        self.requests.append((contents, config))
+        return _Response("Reply.")
+
+
+class _Client:
+    def __init__(self):
+        self.models = _Models()
+
+
+@pytest.fixture
+def genai(monkeypatch):
+    monkeypatch.setenv("GENAI_CONTEXT_CACHE_ENABLED", "true")
+    monkeypatch.setenv("GENAI_CONTEXT_CACHE_BACKEND", "local")
+    monkeypatch.setenv("GENAI_HEDGING_ENABLED", "false")
+    client = _Client()
+    monkeypatch.setattr(GenAIManager, "_client", client)
+    monkeypatch.setattr(GenAIManager, "_context_cache", None)
+    monkeypatch.setattr(GenAIManager, "_circuit_breaker", None)
+    return client
+
+
+def _prompt_texts(contents) -> list:
+    return [part.text for content in contents for part in content.parts]
+
+
+def test_local_cached_prefix_is_created_reused_and_expires(genai):
+    async def scenario():
+        handle = await GenAIManager.get_cached_prefix("Static prompt prefix.", "System prompt.")
+        assert handle.startswith("cachedContents/local-")
+        # Later calls for the same prefix reuse the handle
+        assert await GenAIManager.get_cached_prefix("Static prompt prefix.", "System prompt.") == handle
+
+        # The handle is expanded locally, Gemini receives the full request
+        assert await GenAIManager.generate("Per-user part.", cached_content=handle) == "Reply."
+        contents, config = genai.models.requests[-1]
+        assert _prompt_texts(contents) == ["Static prompt prefix.", "Per-user part."]
+        assert config.system_instruction[0].text == "System prompt."
+        assert config.cached_content is None
+
+        # Once expired, the handle is rejected like Gemini does and a new one is created
+        context_cache = GenAIManager._get_context_cache()
+        expired_at = datetime.now(timezone.utc) - timedelta(seconds=1)
+        context_cache.caches._entries[handle]["expire_time"] = expired_at
+        context_cache._handles = {
+            key: cached.model_copy(update={"expire_time": expired_at})
+            for key, cached in context_cache._handles.items()
+        }
+        with pytest.raises(APIError) as error:
+            await GenAIManager.generate("Per-user part.", cached_content=handle)
+        assert error.value.code == 404
+
+        new_handle = await GenAIManager.get_cached_prefix("Static prompt prefix.", "System prompt.")
+        assert new_handle != handle
+        assert await GenAIManager.generate("Per-user part.", cached_content=new_handle) == "Reply."
+
+    asyncio.run(scenario())
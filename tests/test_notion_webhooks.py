@@ -0,0 +1,160 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from tortoise import Tortoise
+
+from managers.journal_sync_manager import JournalSyncManager
+from managers.notion_integration_manager import NotionIntegrationManager
+from managers.notion_module.local_notion_webhooks import LocalNotionWebhookSimulator
+from managers.notion_module.notion_client_pool import NotionClientPool
+from managers.notion_module.notion_manager_v2 import NotionManagerV2
+from managers.notion_module.notion_webhook_manager import NotionWebhookManager
+from models.models import NotionIntegration, NotionJournalEntryRecord, NotionSyncCursor, User
+from routers import notion
+from utils.utils import encrypt_data
+
+VERIFICATION_TOKEN = "test-verification-token"
+DATABASE_ID = "0123456789abcdef0123456789abcdef"
+# Notion sends ids with dashes, integrations store the template id without them
+EVENT_DATABASE_ID = "01234567-89ab-cdef-0123-456789abcdef"
+
+JOURNAL_PAGE = {
+    "id": "page-1",
+    "created_time": "2026-10-18T08:00:00.000Z",
+    "last_edited_time": "2026-10-18T09:00:00.000Z",
+    "properties": {
+        "Reflection": {"id": "r", "type": "rich_text", "rich_text": [{"plain_text": "A good day."}]},
+        "Ignore Entry": {"id": "i", "type": "checkbox", "checkbox": False},
+    },
+}
+
+
+@pytest.fixture
+def webhooks(monkeypatch):
+    monkeypatch.setenv("NOTION_WEBHOOK_VERIFICATION_TOKEN", VERIFICATION_TOKEN)
+    monkeypatch.setenv("NOTION_WEBHOOK_DEBOUNCE_SECONDS", "0.05")
+    monkeypatch.setenv("NOTION_WEBHOOKS_ENABLED", "true")
+    monkeypatch.setattr(NotionWebhookManager, "_pending", {})
+    monkeypatch.setattr(NotionWebhookManager, "_seen_event_ids", type(NotionWebhookManager._seen_event_ids)())
+    monkeypatch.setattr(NotionWebhookManager, "synced", 0)
+    monkeypatch.setattr(NotionWebhookManager, "failed", 0)
+
+    queries = []
+
+    def handle_notion_request(request: httpx.Request) -> httpx.Response:
+        queries.append(request.url.path)
+        return httpx.Response(200, json={"results": [JOURNAL_PAGE], "has_more": False})
+
+    monkeypatch.setattr(NotionClientPool, "_client", None)
+    NotionClientPool.get().client._transport = httpx.MockTransport(handle_notion_request)
+    return queries
+
+
+def _run(scenario):
+    async def main():
+        await Tortoise.init(db_url="sqlite://:memory:", modules={"models": ["models.models"]})
+        await Tortoise.generate_schemas()
+        try:
+            await User.create(id=1, email="writer@example.com", journal_medium="notion")
+            await NotionIntegration.create(
+                user_id=1, access_token=encrypt_data("notion-token"), page_id=DATABASE_ID, version="v2"
+            )
+            app = FastAPI()
+            app.include_router(notion.router)
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                await scenario(client, LocalNotionWebhookSimulator(VERIFICATION_TOKEN))
+        finally:
+            await NotionWebhookManager.close()
+            await Tortoise.close_connections()
+
+    asyncio.run(main())
+
+
+def test_burst_of_events_syncs_the_user_once(webhooks):
+    async def scenario(client, simulator):
+        event = simulator.page_event("page-1", EVENT_DATABASE_ID)
+        assert (await simulator.deliver(client, event)).json() == {"status": "scheduled", "users": 1}
+        assert (await simulator.deliver(client, event)).json() == {"status": "duplicate"}
+        second_edit = simulator.page_event("page-1", EVENT_DATABASE_ID)
+        assert (await simulator.deliver(client, second_edit)).json() == {"status": "scheduled", "users": 1}
+
+        await asyncio.sleep(0.2)
+        assert webhooks == [f"/v1/databases/{DATABASE_ID}/query"]
+        assert await NotionJournalEntryRecord.filter(page_id="page-1").count() == 1
+
+    _run(scenario)
+
+
+def test_invalid_signature_is_rejected(webhooks):
+    async def scenario(client, simulator):
+        event = simulator.page_event("page-1", EVENT_DATABASE_ID)
+        response = await simulator.deliver(client, event, signature="sha256=forged")
+        assert response.status_code == 401
+        assert NotionWebhookManager.stats()["pending"] == 0
+
+    _run(scenario)
+
+
+def test_failed_event_is_accepted_on_redelivery(webhooks, monkeypatch):
+    async def scenario(client, simulator):
+        lookup = NotionIntegrationManager.get_integrations_by_page_id
+
+        async def failing_lookup(self, page_id):
+            raise Exception("database unavailable")
+
+        event = simulator.page_event("page-1", EVENT_DATABASE_ID)
+        monkeypatch.setattr(NotionIntegrationManager, "get_integrations_by_page_id", failing_lookup)
+        assert (await simulator.deliver(client, event)).status_code == 500
+
+        monkeypatch.setattr(NotionIntegrationManager, "get_integrations_by_page_id", lookup)
+        assert (await simulator.deliver(client, event)).json() == {"status": "scheduled", "users": 1}
+
+    _run(scenario)
+
+
+def test_change_stays_pending_when_the_debounced_sync_is_cancelled(webhooks, monkeypatch):
+    async def scenario(client, simulator):
+        integration = await NotionIntegrationManager().get_integration_by_user_id(1)
+        await JournalSyncManager().sync_user(1, integration)
+        assert await JournalSyncManager().is_fresh(1, integration)
+
+        monkeypatch.setenv("NOTION_WEBHOOK_DEBOUNCE_SECONDS", "60")
+        await simulator.deliver(client, simulator.page_event("page-1", EVENT_DATABASE_ID))
+        # e.g. a deploy restarting the app before the debounce ends
+        await NotionWebhookManager.close()
+
+        assert not await JournalSyncManager().is_fresh(1, integration)
+        await JournalSyncManager().sync_user(1, integration)
+        cursor = await NotionSyncCursor.get(user_id=1)
+        assert cursor.dirty_at is None
+
+    _run(scenario)
+
+
+def test_change_reported_during_a_sync_stays_pending(webhooks, monkeypatch):
+    async def scenario(client, simulator):
+        integration = await NotionIntegrationManager().get_integration_by_user_id(1)
+        await JournalSyncManager().sync_user(1, integration)
+        monkeypatch.setenv("NOTION_WEBHOOK_DEBOUNCE_SECONDS", "60")
+        # A change no sync has picked up yet
+        await simulator.deliver(client, simulator.page_event("page-1", EVENT_DATABASE_ID))
+
+        query_changed_pages = NotionManagerV2.query_changed_pages
+
+        async def query_then_receive_event(self, *args, **kwargs):
+            pages = await query_changed_pages(self, *args, **kwargs)
+            # Another edit, after Notion answered the sync's query
+            await simulator.deliver(client, simulator.page_event("page-1", EVENT_DATABASE_ID))
+            return pages
+
+        monkeypatch.setattr(NotionManagerV2, "query_changed_pages", query_then_receive_event)
+        await JournalSyncManager().sync_user(1, integration)
+
+        cursor = await NotionSyncCursor.get(user_id=1)
+        assert cursor.dirty_at is not None
+        assert not await JournalSyncManager().is_fresh(1, integration)
+
+    _run(scenario)
@@ -0,0 +1,97 @@
+import hashlib
+import logging
+import os
+import re
+import time
+from pathlib import Path
+from typing import Dict, List
+
+logger = logging.getLogger(__name__)
+
+PROMPTS_DIR = Path(__file__).parent.parent / "prompts"
+# Minimum seconds between mtime checks of a cached prompt file
+PROMPT_RELOAD_CHECK_SECONDS = 5
+
+_PLACEHOLDER_PATTERN = re.compile(r"\{\{(\w+)\}\}")
+
+
+class PromptTemplate:
+    """
+    A prompt file loaded into memory, pre-split on its {{placeholder}} markers.
+    """
+
+    def __init__(self, name: str, text: str, mtime: float):
+        self.name = name
+        self.text = text
+        self.mtime = mtime
+        # Short content hash, changes whenever the prompt file is edited
+        self.version = hashlib.sha256(text.encode("utf-8")).hexdigest()[:12]
+        # Even indices are literal text, odd indices are placeholder names
+        self._segments: List[str] = _PLACEHOLDER_PATTERN.split(text)
+
+    @property
+    def placeholders(self) -> List[str]:
+        return self._segments[1::2]
+
+    def render(self, **values: str) -> str:
+        """
+        Substitutes the given placeholder values. Placeholders without a value
+        are left untouched.
+        """
+        parts = []
+        for index, segment in enumerate(self._segments):
+            if index % 2 == 0:
+                parts.append(segment)
+            elif segment in values:
+                parts.append(values[segment])
+            else:
+                parts.append("{{" + segment + "}}")
+        return "".join(parts)
+
+
+class PromptRegistry:
+    """
+    Process-wide cache of prompt templates.
+
+    Each file is read once and only re-read when its mtime changes. The mtime
+    itself is checked at most every PROMPT_RELOAD_CHECK_SECONDS, so regular
+    calls are served from memory.
+    """
+
+    _templates: Dict[str, PromptTemplate] = {}
+    _last_checked: Dict[str, float] = {}
+
+    @classmethod
+    def get(cls, name: str) -> PromptTemplate:
+        template = cls._templates.get(name)
+        now = time.monotonic()
+        if template and now - cls._last_checked.get(name, 0) < PROMPT_RELOAD_CHECK_SECONDS:
+            return template
+
+        path = PROMPTS_DIR / name
+        try:
+            mtime = os.stat(path).st_mtime
+            if template and template.mtime == mtime:
+                cls._last_checked[name] = now
+                return template
+
+            with open(path, "r", encoding="utf-8") as f:
+                text = f.read()
+        except OSError as e:
+            if template:
+                # Keep serving the last good version if the file is briefly unavailable
+                logger.warning(f"Could not reload prompt {name}, using cached version: {e}")
+                cls._last_checked[name] = now
+                return template
+            raise
+
+        new_template = PromptTemplate(name, text, mtime)
+        if template:
+            logger.info(f"Prompt {name} changed on disk, reloaded version {template.version} -> {new_template.version}")
+        cls._templates[name] = new_template
+        cls._last_checked[name] = now
+        return new_template
+
+    @classmethod
+    def get_text(cls, name: str) -> str:
+        return cls.get(name).text
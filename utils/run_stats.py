@@ -0,0 +1,57 @@
+import random
+import time
+from typing import List
+
+# Upper bound on latency samples kept per run, so memory stays flat for large runs
+MAX_LATENCY_SAMPLES = 5000
+
+
+class RunStats:
+    """
+    Collects throughput and latency figures for a batch run.
+
+    Latencies are kept as a fixed-size reservoir sample, which keeps the
+    percentiles representative without growing with the number of users.
+    """
+
+    def __init__(self, max_samples: int = MAX_LATENCY_SAMPLES):
+        self.max_samples = max_samples
+        self.started_at = time.monotonic()
+        self.processed = 0
+        self.succeeded = 0
+        self.failed = 0
+        self._latencies: List[float] = []
+
+    def record(self, latency: float, success: bool):
+        self.processed += 1
+        if success:
+            self.succeeded += 1
+        else:
+            self.failed += 1
+
+        if len(self._latencies) < self.max_samples:
+            self._latencies.append(latency)
+        else:
+            index = random.randrange(self.processed)
+            if index < self.max_samples:
+                self._latencies[index] = latency
+
+    def percentile(self, pct: float) -> float:
+        if not self._latencies:
+            return 0.0
+        ordered = sorted(self._latencies)
+        index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def summary(self) -> dict:
+        elapsed = time.monotonic() - self.started_at
+        return {
+            "processed": self.processed,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "elapsed_seconds": round(elapsed, 2),
+            "throughput_per_second": round(self.processed / elapsed, 2) if elapsed > 0 else 0.0,
+            "latency_p50_seconds": round(self.percentile(50), 2),
+            "latency_p95_seconds": round(self.percentile(95), 2),
+            "latency_max_seconds": round(max(self._latencies, default=0.0), 2),
+        }
@@ -0,0 +1,81 @@
+import logging
+import math
+import os
+
+logger = logging.getLogger(__name__)
+
+CHARS_PER_TOKEN = 4  # Rough estimate used when no tokenizer is available
+# A cut within this fraction of the end is moved back to the previous space
+WORD_BOUNDARY_SLACK = 0.2
+
+
+class TokenCounter:
+    """
+    Counts model tokens for prompt budgeting.
+
+    With GENAI_LOCAL_TOKENIZER=true (needs the optional `sentencepiece`
+    package) tokens are counted with the Gemini tokenizer from google-genai,
+    otherwise they are estimated from the character count.
+    """
+
+    _tokenizer = None
+    _tokenizer_unavailable = False
+
+    @classmethod
+    def _get_tokenizer(cls):
+        if cls._tokenizer_unavailable or os.getenv("GENAI_LOCAL_TOKENIZER", "false").lower() != "true":
+            return None
+        if cls._tokenizer is None:
+            try:
+                from google.genai.local_tokenizer import LocalTokenizer
+
+                cls._tokenizer = LocalTokenizer(
+                    model_name=os.getenv("GOOGLE_GENAI_MODEL", "gemini-2.5-flash")
+                )
+            except Exception as e:
+                logger.warning(f"Local tokenizer unavailable, estimating tokens from characters: {e}")
+                cls._tokenizer_unavailable = True
+                return None
+        return cls._tokenizer
+
+    @staticmethod
+    def estimate(text: str) -> int:
+        return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+    @classmethod
+    def count(cls, text: str) -> int:
+        if not text:
+            return 0
+        tokenizer = cls._get_tokenizer()
+        if tokenizer is not None:
+            try:
+                return tokenizer.count_tokens(text).total_tokens
+            except Exception as e:
+                logger.warning(f"Error counting tokens locally, estimating from characters: {e}")
+        return cls.estimate(text)
+
+    @classmethod
+    def truncate(cls, text: str, max_tokens: int) -> str:
+        """
+        Returns the longest prefix of `text` within `max_tokens`, cut at a word
+        boundary where possible.
+        """
+        if max_tokens <= 0:
+            return ""
+        if cls.count(text) <= max_tokens:
+            return text
+
+        # Token counts grow with the prefix length, so search for the longest fitting prefix
+        low, high = 0, len(text)
+        while low < high:
+            middle = (low + high + 1) // 2
+            if cls.count(text[:middle]) <= max_tokens:
+                low = middle
+            else:
+                high = middle - 1
+
+        prefix = text[:low]
+        boundary = prefix.rfind(" ")
+        if boundary > low * (1 - WORD_BOUNDARY_SLACK):
+            prefix = prefix[:boundary]
+        return prefix.rstrip()